@@ -1,9 +1,13 @@
+import os
 from flask import Flask
 from flask_cors import CORS
 from controllers.video_controller import video_bp
 from controllers.image_controller import image_bp
 from controllers.audio_controller import audio_bp
 from controllers.text_controller import text_bp
+from controllers.status_controller import status_bp
+from controllers.analyze_controller import analyze_bp
+from processors.registry import preload_models
 
 app = Flask(__name__)
 CORS(app)
@@ -12,6 +16,11 @@ app.register_blueprint(video_bp, url_prefix='/api/video')
 app.register_blueprint(image_bp, url_prefix='/api/image')
 app.register_blueprint(audio_bp, url_prefix='/api/audio')
 app.register_blueprint(text_bp, url_prefix='/api/text')
+app.register_blueprint(analyze_bp, url_prefix='/api/analyze')
+app.register_blueprint(status_bp, url_prefix='/api/status')
+
+if os.getenv("DG_PRELOAD_MODELS", "1") == "1":
+    preload_models()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5002)
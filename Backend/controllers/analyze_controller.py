@@ -0,0 +1,29 @@
+import os
+from flask import Blueprint, request, jsonify
+from processors.multimodal.multimodal_processor import process_media, iter_media_events
+from utils.admission import admission_controlled
+from utils.sse import wants_stream, sse_response
+
+analyze_bp = Blueprint('analyze', __name__)
+
+@analyze_bp.route('/', methods=['POST'])
+@admission_controlled('analyze')
+def handle_analyze():
+    media = request.files.get('media') or request.files.get('video')
+    if media is None:
+        return jsonify({'error': 'No media file uploaded'}), 400
+
+    filename = media.filename
+    os.makedirs('uploads', exist_ok=True)
+    save_path = os.path.join('uploads', filename)
+    media.save(save_path)
+
+    # Streaming mode emits each model's verdict as soon as it is ready
+    if wants_stream():
+        return sse_response(iter_media_events(save_path))
+
+    try:
+        results = process_media(save_path)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 422
+    return jsonify(results)
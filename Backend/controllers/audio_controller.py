@@ -1,10 +1,12 @@
 import os
 from flask import Blueprint, request, jsonify
 from processors.audio.audio_processor import process_audio
+from utils.admission import admission_controlled
 
 audio_bp = Blueprint('audio', __name__)
 
 @audio_bp.route('/', methods=['POST'])
+@admission_controlled('audio')
 def handle_audio():
     if 'audio' not in request.files:
         return jsonify({'error': 'No audio file uploaded'}), 400
@@ -1,10 +1,13 @@
 import os
 from flask import Blueprint, request, jsonify
-from processors.image.image_processor import process_image
+from processors.image.image_processor import process_image, iter_image_events
+from utils.admission import admission_controlled
+from utils.sse import wants_stream, sse_response
 
 image_bp = Blueprint('image', __name__)
 
 @image_bp.route('/', methods=['POST'])
+@admission_controlled('image')
 def handle_image():
     if 'image' not in request.files:
         return jsonify({'error': 'No image file uploaded'}), 400
@@ -15,5 +18,12 @@ def handle_image():
     save_path = os.path.join('uploads', filename)
     image.save(save_path)
 
-    results = process_image(save_path)
+    # force=true skips the near-duplicate lookup and re-runs every model
+    force = request.values.get('force', 'false').lower() in ('1', 'true', 'yes')
+
+    # Streaming mode emits each model's verdict as soon as it is ready
+    if wants_stream():
+        return sse_response(iter_image_events(save_path, force=force))
+
+    results = process_image(save_path, force=force)
     return jsonify(results)
@@ -0,0 +1,18 @@
+from flask import Blueprint, jsonify
+from utils.admission import admission_stats
+from utils.mediapipe_pool import pool_stats
+from utils.checkpoints import model_load_stats
+
+status_bp = Blueprint('status', __name__)
+
+@status_bp.route('/admission', methods=['GET'])
+def handle_admission_status():
+    return jsonify(admission_stats())
+
+@status_bp.route('/mediapipe', methods=['GET'])
+def handle_mediapipe_status():
+    return jsonify(pool_stats())
+
+@status_bp.route('/models', methods=['GET'])
+def handle_model_status():
+    return jsonify(model_load_stats())
@@ -1,9 +1,14 @@
+import os
 from flask import Blueprint, request, jsonify
-from processors.text.text_processor import process_text
+from processors.text.text_processor import process_text, process_text_batch
+from utils.admission import admission_controlled
 
 text_bp = Blueprint('text', __name__)
 
+MAX_BATCH_SIZE = int(os.getenv("DG_TEXT_MAX_BATCH", "32"))
+
 @text_bp.route('/', methods=['POST'])
+@admission_controlled('text')
 def handle_text():
     data = request.get_json()
     if not data or 'text' not in data:
@@ -12,3 +17,19 @@ def handle_text():
     text = data['text']
     results = process_text(text)
     return jsonify(results)
+
+@text_bp.route('/batch', methods=['POST'])
+@admission_controlled('text_batch', default_lane='batch')
+def handle_text_batch():
+    data = request.get_json()
+    if not data or not isinstance(data.get('texts'), list) or not data['texts']:
+        return jsonify({'error': 'No texts provided'}), 400
+
+    texts = data['texts']
+    if len(texts) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} texts per batch'}), 413
+    if not all(isinstance(text, str) for text in texts):
+        return jsonify({'error': 'Every entry in texts must be a string'}), 400
+
+    results = process_text_batch(texts)
+    return jsonify({'results': results})
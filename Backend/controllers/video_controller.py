@@ -1,11 +1,14 @@
 # File: controllers/video_controller.py
 import os
 from flask import Blueprint, request, jsonify
-from processors.video.video_processor import process_video
+from processors.video.video_processor import process_video, iter_video_events
+from utils.admission import admission_controlled
+from utils.sse import wants_stream, sse_response
 
 video_bp = Blueprint('video', __name__)
 
 @video_bp.route('/', methods=['POST'])
+@admission_controlled('video')
 def handle_video():
     if 'video' not in request.files:
         return jsonify({'error': 'No video file uploaded'}), 400
@@ -16,5 +19,12 @@ def handle_video():
     save_path = os.path.join('uploads', filename)
     video.save(save_path)
 
-    results = process_video(save_path)
+    # force=true skips the near-duplicate lookup and re-runs every model
+    force = request.values.get('force', 'false').lower() in ('1', 'true', 'yes')
+
+    # Streaming mode emits each model's verdict as soon as it is ready
+    if wants_stream():
+        return sse_response(iter_video_events(save_path, force=force))
+
+    results = process_video(save_path, force=force)
     return jsonify(results)
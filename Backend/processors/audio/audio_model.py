@@ -1,10 +1,13 @@
 # File: processors/audio/audio_model.py
 
 import os
+import threading
 import librosa
 import numpy as np
 import joblib
 import tensorflow as tf
+from utils.feature_store import get_or_extract, detached
+from utils.checkpoints import load_report
 
 # -----------------------------
 # Constants
@@ -20,9 +23,22 @@ scaler_path = os.path.join(base_dir, "models", "audio_scaler_optimizer.joblib")
 model_path = os.path.join(base_dir, "models", "audio_mlp_classifier_optimized.h5")
 encoder_path = os.path.join(base_dir, "models", "audio_label_encoder_optimized.joblib")
 
-scaler = joblib.load(scaler_path)
-label_encoder = joblib.load(encoder_path)
-model = tf.keras.models.load_model(model_path)
+_assets = None
+_assets_lock = threading.Lock()
+
+def get_model():
+    """(scaler, label_encoder, keras model), loaded on first use so MFCC-only decoders skip TensorFlow weights."""
+    global _assets
+    with _assets_lock:
+        if _assets is None:
+            scaler = joblib.load(scaler_path)
+            label_encoder = joblib.load(encoder_path)
+            # Keras .h5 has no memory-mapped loader; its load is only reported
+            with load_report("audio", model_path) as report:
+                model = tf.keras.models.load_model(model_path)
+                report['format'] = "keras-h5"
+            _assets = (scaler, label_encoder, model)
+    return _assets
 
 # -----------------------------
 # Feature Extraction
@@ -36,6 +52,75 @@ def extract_features_mean_mfcc(file_path, n_mfcc=N_MFCC_FEATURES):
         print(f"Error processing file {file_path}: {e}")
         return None
 
+SAMPLE_RATE = 22050   # librosa.load default used at training time
+DURATION = 3.0
+
+def features_from_signal(audio, sample_rate, n_mfcc=N_MFCC_FEATURES):
+    # Same features as extract_features_mean_mfcc, for audio that is already decoded
+    audio = audio[:int(DURATION * sample_rate)]
+    if sample_rate != SAMPLE_RATE:
+        audio = librosa.resample(audio, orig_sr=sample_rate, target_sr=SAMPLE_RATE, res_type='kaiser_fast')
+    mfccs = librosa.feature.mfcc(y=audio, sr=SAMPLE_RATE, n_mfcc=n_mfcc)
+    return {'mfcc_mean': np.mean(mfccs.T, axis=0).astype(np.float32)}
+
+# -----------------------------
+# Feature store
+# -----------------------------
+FEATURE_EXTRACTOR = "audio_mfcc_mean"
+FEATURE_VERSION = 1
+
+def extract_features(file_path):
+    features = extract_features_mean_mfcc(file_path)
+    if features is None:
+        return None
+    return {'mfcc_mean': features.astype(np.float32)}
+
+def load_features(file_path):
+    return get_or_extract(FEATURE_EXTRACTOR, FEATURE_VERSION, file_path, extract_features)
+
+# -----------------------------
+# Scoring head
+# -----------------------------
+def interpret_prediction(prediction):
+    _, label_encoder, _ = get_model()
+    predicted_index = np.argmax(prediction)
+    confidence = float(prediction[predicted_index])
+    predicted_label = label_encoder.inverse_transform([predicted_index])[0].lower()
+
+    # Interpretation logic
+    if predicted_label == "real":
+        if confidence > 0.9:
+            reason = "Highly authentic speech detected."
+        elif confidence > 0.7:
+            reason = "Mostly real-sounding, minor anomalies."
+        else:
+            reason = "Predicted real, but with low confidence."
+    else:
+        if confidence > 0.9:
+            reason = "Highly consistent with deepfake patterns."
+        elif confidence > 0.7:
+            reason = "Likely synthetic with some ambiguity."
+        else:
+            reason = "Predicted fake, low confidence."
+
+    return predicted_label, confidence, reason
+
+def score_features(batch):
+    """Scale and classify a list of feature dicts ({'mfcc_mean'}) in one predict call."""
+    scaler, _, model = get_model()
+    scaled_features = scaler.transform(np.stack([f['mfcc_mean'] for f in batch]))
+    predictions = model.predict(scaled_features, verbose=0)
+    return [interpret_prediction(prediction) for prediction in predictions]
+
+# Bulk scanning (see scan.py): decode in worker processes, score in batches
+def decode_features(file_path):
+    features = load_features(file_path)
+    if features is None:
+        raise ValueError("Feature extraction failed.")
+    return detached(features)
+
+score_decoded = score_features
+
 # -----------------------------
 # Inference Function
 # -----------------------------
@@ -44,33 +129,11 @@ def audio_deepfake_predict(audio_file_path):
         if not os.path.exists(audio_file_path):
             return "unknown", 0.0, "Audio file not found."
 
-        features = extract_features_mean_mfcc(audio_file_path)
+        features = load_features(audio_file_path)
         if features is None:
             return "unknown", 0.0, "Feature extraction failed."
 
-        scaled_features = scaler.transform(features.reshape(1, -1))
-        prediction = model.predict(scaled_features)[0]
-        predicted_index = np.argmax(prediction)
-        confidence = float(prediction[predicted_index])
-        predicted_label = label_encoder.inverse_transform([predicted_index])[0].lower()
-
-        # Interpretation logic
-        if predicted_label == "real":
-            if confidence > 0.9:
-                reason = "Highly authentic speech detected."
-            elif confidence > 0.7:
-                reason = "Mostly real-sounding, minor anomalies."
-            else:
-                reason = "Predicted real, but with low confidence."
-        else:
-            if confidence > 0.9:
-                reason = "Highly consistent with deepfake patterns."
-            elif confidence > 0.7:
-                reason = "Likely synthetic with some ambiguity."
-            else:
-                reason = "Predicted fake, low confidence."
-
-        return predicted_label, confidence, reason
+        return score_features([features])[0]
 
     except Exception as e:
         return "unknown", 0.0, f"Audio prediction error: {str(e)}"
@@ -0,0 +1,264 @@
+# File: processors/ensemble.py
+#
+# Calibrated, weighted fusion of per-model verdicts.
+#
+# Every model's (label, confidence) is turned into a raw fake score, mapped
+# through a per-model calibrator (Platt or isotonic) to P(fake), and the
+# calibrated log-odds are combined with learned weights:
+#
+#     P(fake) = sigmoid(bias + sum_m weight_m * logit(p_m))
+#
+# Calibrators and weights are fitted offline from a labelled CSV:
+#
+#     python -m processors.ensemble fit labelled.csv --group video
+#
+# A group without a fitted config keeps the plain majority vote for its label
+# (ties go to "real"); fake_probability is still reported from uncalibrated
+# scores. When a group's config sets early-exit thresholds, its models run as a
+# cascade (cheapest first) and the expensive ones are skipped once the
+# fused probability is already decisive.
+
+import os
+import csv
+import json
+import math
+import argparse
+import numpy as np
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.getenv("DG_FUSION_CONFIG", os.path.join(base_dir, "fusion_config.json"))
+
+EPS = 1e-4
+
+# These models' "confidence" is not P(label): rPPG reports bpm / 120 and the
+# zero-shot model the softmax of its best CLIP prompt, while its label comes
+# from blur/noise heuristics. Only their label is used, as a bounded score, so
+# one of them can never outweigh a confident calibrated model on its own.
+LABEL_ONLY_MODELS = {"rppg", "zeroshot"}
+LABEL_ONLY_SCORE = 0.75
+
+
+def _logit(p):
+    p = min(max(p, EPS), 1 - EPS)
+    return math.log(p / (1 - p))
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def raw_score(name, info):
+    """Uncalibrated fake score in [0, 1], or None when the model produced no verdict."""
+    label = str(info['label']).lower()
+    if label not in ('fake', 'real'):
+        return None
+    if name in LABEL_ONLY_MODELS:
+        return LABEL_ONLY_SCORE if label == 'fake' else 1.0 - LABEL_ONLY_SCORE
+    confidence = float(info['confidence'])
+    return confidence if label == 'fake' else 1.0 - confidence
+
+
+# -----------------------------
+# Calibrators
+# -----------------------------
+def calibrate(calibration, score):
+    kind = (calibration or {}).get('type', 'identity')
+    if kind == 'platt':
+        return _sigmoid(calibration['a'] * score + calibration['b'])
+    if kind == 'isotonic':
+        return float(np.interp(score, calibration['x'], calibration['y']))
+    return score
+
+
+# -----------------------------
+# Fusion engine
+# -----------------------------
+class FusionEngine:
+    def __init__(self, config=None):
+        self.config = config or {}
+
+    @classmethod
+    def load(cls, path=CONFIG_PATH):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _group(self, group):
+        return self.config.get('groups', {}).get(group, {})
+
+    def _model(self, group, name):
+        return self._group(group).get('models', {}).get(name, {})
+
+    def fitted(self, group):
+        return bool(self._group(group).get('models'))
+
+    def stages(self, group, models):
+        """
+        Order in which to run `models`: a single concurrent stage unless the
+        group has a fitted config with early exit, then cheapest model first.
+        """
+        cfg = self._group(group)
+        if not cfg.get('early_exit') or not self.fitted(group):
+            return [list(models)]
+        order = cfg.get('order') or sorted(models, key=lambda m: self._model(group, m).get('cost', 1.0))
+        ordered = [m for m in order if m in models] + [m for m in models if m not in order]
+        return [[m] for m in ordered]
+
+    def fake_probability(self, group, output):
+        z = self._group(group).get('bias', 0.0)
+        calibrated = {}
+        for name, info in output.items():
+            score = raw_score(name, info)
+            if score is None:
+                continue
+            model_cfg = self._model(group, name)
+            p = calibrate(model_cfg.get('calibration'), score)
+            calibrated[name] = round(p, 4)
+            z += model_cfg.get('weight', 1.0) * _logit(p)
+        return _sigmoid(z), calibrated
+
+    def decisive(self, group, output):
+        early_exit = self._group(group).get('early_exit')
+        if not early_exit or not self.fitted(group):
+            return False
+        p, calibrated = self.fake_probability(group, output)
+        if not calibrated:
+            return False
+        return p >= early_exit.get('fake', 1.0) or p <= early_exit.get('real', 0.0)
+
+    def fuse(self, group, output, skipped=()):
+        """Overall verdict in the same shape the processors always returned, plus fusion details."""
+        p, calibrated = self.fake_probability(group, output)
+        threshold = self._group(group).get('threshold', 0.5)
+
+        fake_votes = [m for m in output if str(output[m]['label']).lower() == 'fake']
+        real_votes = [m for m in output if str(output[m]['label']).lower() == 'real']
+
+        if self.fitted(group):
+            label = "fake" if calibrated and p > threshold else "real"
+        else:
+            # Uncalibrated scores are not comparable across models; count votes, ties go to "real"
+            label = "fake" if len(fake_votes) > len(real_votes) else "real"
+
+        return {
+            'label': label,
+            'fake_probability': round(p, 4),
+            'calibrated_scores': calibrated,
+            'model_confidences': {
+                model: {
+                    'label': info['label'],
+                    'confidence': info['confidence'],
+                    'reason': info['reason']
+                } for model, info in output.items()
+            },
+            'fake_by': fake_votes,
+            'real_by': real_votes,
+            'skipped': list(skipped),
+            'early_exit': bool(skipped)
+        }
+
+
+engine = FusionEngine.load()
+
+
+# -----------------------------
+# Offline fitting
+# -----------------------------
+def _read_labelled_csv(path):
+    """
+    Rows need a `label` column (fake/real or 1/0) and, per model, `<model>_label`
+    and `<model>_confidence` columns (empty when the model did not run).
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    models = sorted({col[:-len('_label')] for col in rows[0] if col.endswith('_label')}) if rows else []
+
+    y = np.array([1 if str(r['label']).strip().lower() in ('1', 'fake') else 0 for r in rows])
+    raw = {}
+    for name in models:
+        scores = []
+        for r in rows:
+            if not r.get(f'{name}_label'):
+                scores.append(None)
+                continue
+            scores.append(raw_score(name, {'label': r[f'{name}_label'],
+                                           'confidence': r.get(f'{name}_confidence') or 0.0}))
+        raw[name] = scores
+    return y, raw
+
+
+def fit_group(csv_path, method="platt", early_exit=None, order=None):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.isotonic import IsotonicRegression
+
+    y, raw = _read_labelled_csv(csv_path)
+    models_cfg = {}
+    features = np.zeros((len(y), len(raw)))
+
+    for j, (name, scores) in enumerate(raw.items()):
+        mask = np.array([s is not None for s in scores])
+        if mask.sum() < 2 or len(set(y[mask])) < 2:
+            continue  # not enough labelled outputs to calibrate this model
+        x = np.array([s for s in scores if s is not None], dtype=float)
+
+        if method == "isotonic":
+            iso = IsotonicRegression(out_of_bounds="clip", y_min=EPS, y_max=1 - EPS).fit(x, y[mask])
+            calibration = {'type': 'isotonic', 'x': iso.X_thresholds_.tolist(), 'y': iso.y_thresholds_.tolist()}
+        else:
+            lr = LogisticRegression(C=1e4).fit(x.reshape(-1, 1), y[mask])
+            calibration = {'type': 'platt', 'a': float(lr.coef_[0][0]), 'b': float(lr.intercept_[0])}
+
+        models_cfg[name] = {'calibration': calibration}
+        # Missing outputs contribute logit(0.5) = 0
+        features[mask, j] = [_logit(calibrate(calibration, s)) for s in x]
+
+    fitted = [j for j, name in enumerate(raw) if name in models_cfg]
+    combiner = LogisticRegression(C=1e4).fit(features[:, fitted], y)
+    for k, j in enumerate(fitted):
+        models_cfg[list(raw)[j]]['weight'] = float(combiner.coef_[0][k])
+
+    group_cfg = {'bias': float(combiner.intercept_[0]), 'threshold': 0.5, 'models': models_cfg}
+    if early_exit:
+        group_cfg['early_exit'] = early_exit
+        group_cfg['order'] = order or list(models_cfg)
+
+    # Training-set accuracy of the fused verdict, for a quick sanity check
+    probs = np.array([_sigmoid(v) for v in combiner.decision_function(features[:, fitted])])
+    accuracy = float(((probs > 0.5).astype(int) == y).mean())
+    return group_cfg, accuracy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit fusion calibrators and weights from a labelled CSV")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fit = sub.add_parser("fit")
+    fit.add_argument("csv", help="Labelled per-model outputs (see _read_labelled_csv)")
+    fit.add_argument("--group", required=True, help="image, video or multimodal")
+    fit.add_argument("--method", choices=["platt", "isotonic"], default="platt")
+    fit.add_argument("--order", help="Comma-separated cascade order, cheapest first (e.g. cnn,zeroshot)")
+    fit.add_argument("--exit-fake", type=float, help="Stop the cascade once P(fake) >= this")
+    fit.add_argument("--exit-real", type=float, help="Stop the cascade once P(fake) <= this")
+    fit.add_argument("--out", default=CONFIG_PATH)
+    args = parser.parse_args()
+
+    early_exit = None
+    if args.exit_fake is not None or args.exit_real is not None:
+        early_exit = {'fake': args.exit_fake if args.exit_fake is not None else 1.0,
+                      'real': args.exit_real if args.exit_real is not None else 0.0}
+    order = args.order.split(",") if args.order else None
+
+    group_cfg, accuracy = fit_group(args.csv, args.method, early_exit, order)
+
+    config = {}
+    if os.path.exists(args.out):
+        with open(args.out, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    config.setdefault('groups', {})[args.group] = group_cfg
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    print(f"[{args.group}] fitted {len(group_cfg['models'])} models, training accuracy {accuracy:.3f} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
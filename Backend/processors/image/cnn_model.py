@@ -1,7 +1,13 @@
+import os
+import math
+import threading
+import numpy as np
 import torch
 import torch.nn as nn
 from torchvision import transforms
 from PIL import Image
+from utils.checkpoints import load_weights
+from utils.mediapipe_pool import face_detection_pool
 
 # ===== CustomCNN Definition (match your training code) =====
 class CustomCNN(nn.Module):
@@ -31,12 +37,22 @@ class CustomCNN(nn.Module):
 
 # ===== Load model =====
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = CustomCNN().to(device)
+model_path = os.path.join(os.path.dirname(__file__), "models", "custom_model_cuda128_compatible.pth")
+_model = None
+_model_lock = threading.Lock()
 
-checkpoint = torch.load("processors\image\models\custom_model_cuda128_compatible.pth", map_location=device)
-model.load_state_dict(checkpoint['model_state_dict'])
-model.eval()
-print("✅ Model loaded successfully")
+def get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            model = CustomCNN().to(device)
+            # Memory-mapped safetensors when converted, else the .pth's model_state_dict
+            load_weights(model, model_path, device, name="cnn")
+            model = model.to(memory_format=torch.channels_last)
+            model.eval()
+            print("✅ Model loaded successfully")
+            _model = model
+    return _model
 
 # ===== Transform (same as test_transform) =====
 transform = transforms.Compose([
@@ -44,19 +60,124 @@ transform = transforms.Compose([
     transforms.ToTensor()
 ])
 
-# ===== Prediction function =====
-def predict_image(image_path):
-    image = Image.open(image_path).convert("RGB")
-    input_tensor = transform(image).unsqueeze(0).to(device)
+# ===== Tiled regions =====
+# Resizing a large photo to 224x224 destroys the artifacts the CNN looks for.
+# Besides that global view, the CNN also sees detected faces and a grid of
+# native-resolution tiles, capped so a 20-megapixel input stays one small batch.
+INPUT_SIZE = 224
+TILED = os.getenv("DG_CNN_TILED", "1") == "1"
+MAX_FACES = int(os.getenv("DG_CNN_MAX_FACES", "4"))
+MAX_TILES = int(os.getenv("DG_CNN_MAX_TILES", "12"))
+FACE_MARGIN = 0.2
+DETECT_SIDE = 1280  # faces are detected on a downscaled copy
+# How region scores become the verdict:
+#   "faces"  (default) most suspicious face when faces were found, else the mean of the global view and tiles;
+#            a swapped face must not be averaged away by a dozen background tiles
+#   "mean"   mean over all regions
+#   "max"    most suspicious region of any kind
+#   "global" resized view only (the original behaviour)
+AGGREGATE = os.getenv("DG_CNN_AGGREGATE", "faces")
+MAX_FORWARD = int(os.getenv("DG_CNN_MAX_FORWARD", "64"))  # regions per forward pass
+SCORING_CONFIG = {'tiled': TILED, 'faces': MAX_FACES, 'tiles': MAX_TILES, 'aggregate': AGGREGATE}
+
+def _face_boxes(image):
+    # Face boxes in full-resolution pixels, expanded by FACE_MARGIN on each side
+    width, height = image.size
+    small = image.copy()
+    small.thumbnail((DETECT_SIDE, DETECT_SIDE))
+    with face_detection_pool.checkout() as face_detector:
+        results = face_detector.process(np.asarray(small))
+
+    boxes = []
+    for detection in (results.detections or [])[:MAX_FACES]:
+        box = detection.location_data.relative_bounding_box
+        mx, my = box.width * FACE_MARGIN, box.height * FACE_MARGIN
+        left = int(max(box.xmin - mx, 0) * width)
+        top = int(max(box.ymin - my, 0) * height)
+        right = int(min(box.xmin + box.width + mx, 1) * width)
+        bottom = int(min(box.ymin + box.height + my, 1) * height)
+        if right - left >= 16 and bottom - top >= 16:
+            boxes.append((left, top, right, bottom))
+    return boxes
+
+def _tile_boxes(width, height):
+    # Evenly spread INPUT_SIZE tiles; only worth it when the image is well above the input size
+    if MAX_TILES <= 0 or max(width, height) < 2 * INPUT_SIZE:
+        return []
+    cols, rows = math.ceil(width / INPUT_SIZE), math.ceil(height / INPUT_SIZE)
+    if cols * rows > MAX_TILES:
+        scale = math.sqrt(MAX_TILES / (cols * rows))
+        cols, rows = max(1, int(cols * scale)), max(1, int(rows * scale))
+    tile_w, tile_h = min(INPUT_SIZE, width), min(INPUT_SIZE, height)
+    xs = np.linspace(0, width - tile_w, cols).astype(int)
+    ys = np.linspace(0, height - tile_h, rows).astype(int)
+    return [(x, y, x + tile_w, y + tile_h) for y in ys for x in xs]
+
+def _region(image, box=None):
+    crop = image if box is None else image.crop(box)
+    # Same bilinear resize as `transform`, kept as uint8 HWC until scoring
+    return np.asarray(crop.resize((INPUT_SIZE, INPUT_SIZE), Image.BILINEAR), dtype=np.uint8)
+
+# ===== Batched inference (also used by scan.py) =====
+def features_from_image(image):
+    """{'regions': uint8 [N, 224, 224, 3], 'kinds': [N]}: the resized image, then face crops, then tiles."""
+    regions, kinds = [_region(image)], ["global"]
+    if TILED and AGGREGATE != "global":
+        # A failed detection (e.g. pool timeout) fails the model visibly rather than dropping the faces
+        for box in _face_boxes(image):
+            regions.append(_region(image, box))
+            kinds.append("face")
+        for box in _tile_boxes(*image.size):
+            regions.append(_region(image, box))
+            kinds.append("tile")
+    return {'regions': np.stack(regions), 'kinds': np.array(kinds)}
 
-    with torch.no_grad():
-        output = model(input_tensor)
-        prob = output.item()
-        label = int(prob > 0.5)
+def decode_features(image_path):
+    return features_from_image(Image.open(image_path).convert("RGB"))
 
-    class_names = ['fake', 'real']
-    reason ="temp reason"
-    if class_names[label].lower() == "fake":
-        prob = 1 - prob
+def _real_probabilities(regions):
+    # uint8 NHWC -> float NCHW; the permuted view is already channels-last in memory
+    model = get_model()
+    probs = []
+    with torch.inference_mode():
+        for start in range(0, len(regions), MAX_FORWARD):
+            chunk = torch.from_numpy(np.ascontiguousarray(regions[start:start + MAX_FORWARD])).to(device)
+            chunk = chunk.permute(0, 3, 1, 2).float().div_(255.0).contiguous(memory_format=torch.channels_last)
+            probs.extend(model(chunk).view(-1).tolist())
+    return probs
 
-    return class_names[label], prob, reason
+def _verdict(kinds, real_probs):
+    fake_probs = [1 - p for p in real_probs]
+    face_probs = [p for kind, p in zip(kinds, fake_probs) if kind == "face"]
+    if AGGREGATE == "global" or len(fake_probs) == 1:
+        fake_prob = fake_probs[0]
+    elif AGGREGATE == "max":
+        fake_prob = max(fake_probs)
+    elif AGGREGATE == "faces" and face_probs:
+        fake_prob = max(face_probs)
+    else:
+        fake_prob = float(np.mean(fake_probs))
+
+    label = "fake" if fake_prob >= 0.5 else "real"
+    prob = fake_prob if label == "fake" else 1 - fake_prob
+    worst = int(np.argmax(fake_probs))
+    flagged = sum(p >= 0.5 for p in fake_probs)
+    reason = (f"{flagged} of {len(fake_probs)} regions look manipulated "
+              f"(most suspicious: {kinds[worst]}, {fake_probs[worst]:.2f})")
+    return label, prob, reason
+
+def score_decoded(batch):
+    """Score every region of every image in the batch together, then aggregate per image."""
+    real_probs = _real_probabilities(np.concatenate([f['regions'] for f in batch]))
+
+    results = []
+    offset = 0
+    for features in batch:
+        count = len(features['regions'])
+        results.append(_verdict([str(k) for k in features['kinds']], real_probs[offset:offset + count]))
+        offset += count
+    return results
+
+# ===== Prediction function =====
+def predict_image(image_path):
+    return score_decoded([decode_features(image_path)])[0]
@@ -1,70 +1,47 @@
-import threading
+import os
 from processors.image.zeroshot_model import analyze_image
 from processors.image.cnn_model import predict_image
-
-def process_image(image_path):
-    results = {}
-
-    def run_model(name, func, output_dict):
-        try:
-            label, confidence, reason = func(image_path)
-
-            # Normalize output format based on model type
-            if name == "cnn":
-                output_dict[name] = {
-                    'label': label,
-                    'confidence': confidence,
-                    'reason': reason  # string
-                }
-            elif name == "zeroshot":
-                output_dict[name] = {
-                    'label': label,
-                    'confidence': confidence,
-                    'reason': {
-                        'classification_scores': reason  # dict of scores
-                    }
-                }
-        except Exception as e:
-            output_dict[name] = {
-                'label': 'error',
-                'confidence': 0.0,
-                'reason': f'Exception: {str(e)}'
-            }
-
-    threads = []
-    output = {}
-
-    models = {
-        "zeroshot": analyze_image,
-        "cnn": predict_image
-    }
-
-    for name, func in models.items():
-        t = threading.Thread(target=run_model, args=(name, func, output))
-        threads.append(t)
-        t.start()
-
-    for t in threads:
-        t.join()
-
-    # Tally votes
-    fake_votes = [m for m in output if output[m]['label'].lower() == 'fake']
-    real_votes = [m for m in output if output[m]['label'].lower() == 'real']
-
-    overall_label = "fake" if len(fake_votes) > len(real_votes) else "real"
-
-    results['overall'] = {
-        'label': overall_label,
-        'model_confidences': {
-            model: {
-                'label': info['label'],
-                'confidence': info['confidence'],
-                'reason': info['reason']
-            } for model, info in output.items()
-        },
-        'fake_by': fake_votes,
-        'real_by': real_votes
+from processors.ensemble import engine
+from processors.runner import iter_model_events
+from processors.registry import verdict_version
+from utils.near_duplicate import lookup_media, remember_media
+
+models = {
+    "zeroshot": analyze_image,
+    "cnn": predict_image
+}
+
+def iter_image_events(image_path, force=False):
+    """
+    Run the image models and yield (event, data) pairs: one 'model' event per
+    finished model, then the 'overall' verdict. Models run concurrently, or as
+    a cheapest-first cascade when the fusion config enables early exit.
+    """
+    # Re-encoded / resized copies of an already analysed image reuse its verdict
+    version = verdict_version(tuple(models), "image")
+    hashes, cached = lookup_media("image", image_path, version)
+    if cached is not None and not force:
+        yield 'overall', cached
+        return
+
+    def call(name, func):
+        label, confidence, reason = func(image_path)
+        if name == "zeroshot":
+            reason = {'classification_scores': reason}  # dict of scores
+        return label, confidence, reason
+
+    yield 'progress', {'stage': 'started', 'models': list(models)}
+    output, skipped = yield from iter_model_events(models, call, "image")
+
+    # Calibrated, weighted fusion of the model verdicts
+    results = {
+        'overall': engine.fuse("image", output, skipped=skipped),
+        'image_models': output
     }
+    yield 'overall', remember_media("image", hashes, results, output, version,
+                                  source=os.path.basename(image_path))
 
-    results['image_models'] = output
-    return results
+def process_image(image_path, force=False):
+    for event, data in iter_image_events(image_path, force=force):
+        if event == 'overall':
+            return data
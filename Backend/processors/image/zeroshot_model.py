@@ -3,11 +3,16 @@ import numpy as np
 from PIL import Image, ImageChops, ImageEnhance
 import torch
 from transformers import CLIPProcessor, CLIPModel
+import os
 import tempfile
+import threading
+from utils.feature_store import get_or_extract, lookup, save, detached
+from utils.checkpoints import load_report
 
-# Load updated CLIP model and processor
-model = CLIPModel.from_pretrained("laion/CLIP-ViT-H-14-laion2B-s32B-b79K")
-processor = CLIPProcessor.from_pretrained("laion/CLIP-ViT-H-14-laion2B-s32B-b79K")
+# Load updated CLIP model and processor. The processor is light and needed by
+# CPU-only decoders; the ViT-H weights load on first use (see get_model).
+MODEL_NAME = "laion/CLIP-ViT-H-14-laion2B-s32B-b79K"
+processor = CLIPProcessor.from_pretrained(MODEL_NAME)
 
 # Updated prompt list
 text_inputs = [
@@ -29,33 +34,134 @@ def noise_analysis(image_cv):
     residual = cv2.absdiff(gray, denoised)
     return residual
 
-def classify_image(image_pil):
-    inputs = processor(text=text_inputs, images=image_pil, return_tensors="pt", padding=True)
+# Prompts never change, so their normalized CLIP text embeddings are computed once
+def _text_embeddings(model):
+    inputs = processor(text=text_inputs, return_tensors="pt", padding=True)
+    with torch.no_grad():
+        embeds = model.get_text_features(**inputs)
+    return embeds / embeds.norm(dim=-1, keepdim=True)
+
+_model = None
+_text_embeds = None
+_model_lock = threading.Lock()
+
+def get_model():
+    global _model, _text_embeds
+    with _model_lock:
+        if _model is None:
+            # low_cpu_mem_usage skips the random init and loads the safetensors weights straight in
+            with load_report("zeroshot", MODEL_NAME) as report:
+                model = CLIPModel.from_pretrained(MODEL_NAME, low_cpu_mem_usage=True)
+                report['format'] = "hf-safetensors"
+            model.eval()
+            _text_embeds = _text_embeddings(model)
+            _model = model
+    return _model
+
+def embed_pixels(pixel_values):
+    # [B, 3, H, W] preprocessed pixels -> [B, D] normalized image embeddings
+    model = get_model()
     with torch.no_grad():
-        outputs = model(**inputs)
-        probs = outputs.logits_per_image.softmax(dim=1)[0].detach().numpy()
+        embeds = model.get_image_features(pixel_values=torch.as_tensor(pixel_values))
+    return embeds / embeds.norm(dim=-1, keepdim=True)
+
+def image_embedding(image_pil):
+    inputs = processor(images=image_pil, return_tensors="pt")
+    return embed_pixels(inputs['pixel_values'])[0]
+
+def probs_from_embeddings(image_embeds):
+    # Same as CLIPModel's logits_per_image: scaled cosine similarity, softmax over prompts
+    model = get_model()
+    with torch.no_grad():
+        logits = model.logit_scale.exp() * torch.as_tensor(image_embeds) @ _text_embeds.T
+        return logits.softmax(dim=1).numpy()
+
+def _scores(probs):
     label_scores = {label: float(f"{score:.4f}") for label, score in zip(text_inputs, probs)}
     best_idx = int(np.argmax(probs))
     best_label = text_inputs[best_idx]
     best_confidence = float(probs[best_idx])
     return best_label, best_confidence, label_scores
 
-def analyze_image(image_path):
+def classify_image(image_pil):
+    probs = probs_from_embeddings(image_embedding(image_pil).unsqueeze(0))[0]
+    return _scores(probs)
+
+# -----------------------------
+# Feature store
+# -----------------------------
+FEATURE_EXTRACTOR = "zeroshot_clip"
+FEATURE_VERSION = 1
+
+def preprocess(image_path):
+    # CPU-only half of extraction: CLIP pixel values plus noise/blur statistics
     image_cv = cv2.imread(image_path)
     image_pil = Image.open(image_path).convert("RGB")
+    return features_from_image(image_cv, image_pil)
 
-    # CLIP-based classification
-    best_label, confidence, label_scores = classify_image(image_pil)
-
+def features_from_image(image_cv, image_pil):
     # Noise and blur analysis
     residual_img = noise_analysis(image_cv)
     blur_score = blur_detector(image_cv)
 
-    # Heuristic final verdict
-    suspicious_keywords = ["deepfake", "AI-generated", "fake"]
-    suspicious = any(keyword in best_label.lower() for keyword in suspicious_keywords) \
-                 or blur_score < 100 \
-                 or np.mean(residual_img) > 20
+    return {
+        'pixel_values': processor(images=image_pil, return_tensors="np")['pixel_values'][0],
+        'stats': np.array([blur_score, np.mean(residual_img)], dtype=np.float64)  # [blur, residual mean]
+    }
+
+def extract_features(image_path):
+    features = preprocess(image_path)
+    return {
+        'image_embeds': embed_pixels(features['pixel_values'][None]).numpy()[0].astype(np.float32),
+        'stats': features['stats']
+    }
+
+def load_features(image_path):
+    return get_or_extract(FEATURE_EXTRACTOR, FEATURE_VERSION, image_path, extract_features)
+
+def score_features(batch):
+    """Zero-shot verdicts for a list of feature dicts ({'image_embeds', 'stats'}) in one matmul."""
+    all_probs = probs_from_embeddings(np.stack([f['image_embeds'] for f in batch]))
+    results = []
+    for features, probs in zip(batch, all_probs):
+        best_label, confidence, label_scores = _scores(probs)
+        blur_score, residual_mean = features['stats']
 
-    final_result = "Fake" if suspicious else "Real"
-    return final_result, round(confidence, 4), label_scores
+        # Heuristic final verdict
+        suspicious_keywords = ["deepfake", "AI-generated", "fake"]
+        suspicious = any(keyword in best_label.lower() for keyword in suspicious_keywords) \
+                     or blur_score < 100 \
+                     or residual_mean > 20
+
+        final_result = "Fake" if suspicious else "Real"
+        results.append((final_result, round(confidence, 4), label_scores))
+    return results
+
+# -----------------------------
+# Bulk scanning (see scan.py)
+# -----------------------------
+def decode_features(image_path):
+    # Stored features when available, otherwise preprocessed pixels for the inference worker
+    content_hash, stored = lookup(FEATURE_EXTRACTOR, FEATURE_VERSION, image_path)
+    if stored is not None:
+        return detached(stored)
+    features = preprocess(image_path)
+    features['content_hash'] = content_hash
+    features['source'] = os.path.basename(image_path)
+    return features
+
+def score_decoded(batch):
+    # Embed every not-yet-stored image in one CLIP forward pass, then score all
+    pending = [f for f in batch if 'image_embeds' not in f]
+    if pending:
+        embeds = embed_pixels(np.stack([f['pixel_values'] for f in pending])).numpy().astype(np.float32)
+        for f, e in zip(pending, embeds):
+            f['image_embeds'] = e
+            if 'content_hash' in f:  # in-memory frames (e.g. video keyframes) are not stored
+                save(FEATURE_EXTRACTOR, FEATURE_VERSION, f['content_hash'],
+                     {'image_embeds': e, 'stats': f['stats']}, source=f['source'])
+    return score_features(batch)
+
+def analyze_image(image_path):
+    # CLIP embedding plus noise/blur statistics, read from the feature store when present
+    return score_features([load_features(image_path)])[0]
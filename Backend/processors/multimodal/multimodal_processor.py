@@ -0,0 +1,156 @@
+# File: processors/multimodal/multimodal_processor.py
+import os
+import cv2
+import numpy as np
+from PIL import Image
+from processors.video import rppg_model, lipsync_model
+from processors.audio import audio_model
+from processors.image import zeroshot_model, cnn_model
+from processors.ensemble import engine
+from processors.runner import iter_model_events
+from utils.media import decode_video_sampled, load_audio_track
+
+# Only a bounded window is decoded for rPPG and lip-sync (300 frames is 10 s at
+# 30 fps, enough for their 150-frame clips), stored at 640 px: both work on face
+# crops far smaller than that. The image models' keyframes are seeked to across
+# the whole file and kept larger, since the CNN looks for fine artifacts.
+MAX_FRAMES = int(os.getenv("DG_ANALYZE_MAX_FRAMES", "300"))
+MAX_SIDE = int(os.getenv("DG_ANALYZE_MAX_SIDE", "640"))
+KEYFRAME_SIDE = int(os.getenv("DG_ANALYZE_KEYFRAME_SIDE", "1280"))
+NUM_KEYFRAMES = int(os.getenv("DG_ANALYZE_KEYFRAMES", "3"))
+
+MODEL_MODALITY = {
+    "rppg": "video",
+    "lipsync": "video",
+    "audio": "audio",
+    "zeroshot": "image",
+    "cnn": "image",
+}
+
+
+def _keyframes(frames, count=NUM_KEYFRAMES):
+    if not frames:
+        return []
+    positions = np.linspace(0, len(frames) - 1, count + 2)[1:-1] if len(frames) > count else range(len(frames))
+    return [frames[int(i)] for i in positions]
+
+
+def _keyframe_verdict(results):
+    # Majority over keyframes; confidence averaged over the keyframes that agree
+    labels = [label.lower() for label, _, _ in results]
+    label = "fake" if labels.count("fake") > len(labels) / 2 else "real"
+    agreeing = [conf for (l, conf, _), norm in zip(results, labels) if norm == label]
+    return label, float(np.mean(agreeing)) if agreeing else 0.0, {
+        'keyframes': [{'label': l, 'confidence': conf} for l, conf, _ in results]
+    }
+
+
+# -----------------------------
+# Per-model runners over the shared buffers
+# -----------------------------
+def _run_rppg(media):
+    clip = rppg_model.face_clip_from_frames(media['frames'])
+    return rppg_model.score_features([{'clip': clip}])[0]
+
+
+def _run_lipsync(media):
+    landmarks = lipsync_model.lip_landmarks_from_frames(media['frames'])
+    if landmarks is None:
+        return "error", 0.0, "Lip landmarks could not be extracted"
+    if media['audio'] is None:
+        return "error", 0.0, "Audio features could not be extracted"
+    lips, lip_frames = landmarks
+    audio, mfcc_rate = lipsync_model.mfcc_from_signal(*media['audio'], span_seconds=len(media['frames']) / media['fps'])
+    features = lipsync_model.build_features(lips, lip_frames, media['fps'], audio, mfcc_rate)
+    return lipsync_model.score_features([features])[0]
+
+
+def _run_audio(media):
+    if media['audio'] is None:
+        return "unknown", 0.0, "No audio track found."
+    return audio_model.score_features([audio_model.features_from_signal(*media['audio'])])[0]
+
+
+def _run_zeroshot(media):
+    batch = [zeroshot_model.features_from_image(frame, Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+             for frame in media['keyframes']]
+    return _keyframe_verdict(zeroshot_model.score_decoded(batch))
+
+
+def _run_cnn(media):
+    batch = [cnn_model.features_from_image(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+             for frame in media['keyframes']]
+    return _keyframe_verdict(cnn_model.score_decoded(batch))
+
+
+runners = {
+    "rppg": _run_rppg,
+    "lipsync": _run_lipsync,
+    "audio": _run_audio,
+    "zeroshot": _run_zeroshot,
+    "cnn": _run_cnn,
+}
+
+
+def decode_media(media_path):
+    frames, keyframes, fps, total_frames = decode_video_sampled(
+        media_path, max_frames=MAX_FRAMES, max_side=MAX_SIDE, num_keyframes=NUM_KEYFRAMES,
+        keyframe_side=KEYFRAME_SIDE)
+    if not frames:
+        raise ValueError("No video frames could be decoded.")
+    return {
+        'frames': frames,
+        'fps': fps,
+        'total_frames': total_frames,
+        'keyframes': keyframes or _keyframes(frames),
+        'audio': load_audio_track(media_path)  # (samples, sample_rate) or None
+    }
+
+
+def iter_media_events(media_path):
+    """
+    Decode `media_path` once, run every model concurrently on the shared frames
+    and audio, and yield (event, data) pairs like the video/image processors.
+    """
+    yield 'progress', {'stage': 'started', 'models': list(runners)}
+    try:
+        media = decode_media(media_path)
+    except ValueError as e:
+        yield 'error', {'error': str(e)}
+        return
+    yield 'progress', {
+        'stage': 'decoded',
+        'frames': len(media['frames']),
+        'total_frames': media['total_frames'],
+        'fps': media['fps'],
+        'has_audio': media['audio'] is not None
+    }
+
+    def call(name, func):
+        return func(media)
+
+    output, skipped = yield from iter_model_events(
+        runners, call, "multimodal", describe=lambda name: {'modality': MODEL_MODALITY[name]})
+
+    modalities = {}
+    for name, info in output.items():
+        modalities.setdefault(MODEL_MODALITY[name], {})[name] = info
+
+    yield 'overall', {
+        'overall': engine.fuse("multimodal", output, skipped=skipped),
+        'modalities': modalities,
+        'media': {
+            'frames_analyzed': len(media['frames']),
+            'total_frames': media['total_frames'],
+            'fps': media['fps'],
+            'has_audio': media['audio'] is not None
+        }
+    }
+
+
+def process_media(media_path):
+    for event, data in iter_media_events(media_path):
+        if event == 'error':
+            raise ValueError(data['error'])
+        if event == 'overall':
+            return data
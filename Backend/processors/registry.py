@@ -0,0 +1,66 @@
+# File: processors/registry.py
+import os
+import json
+import hashlib
+import importlib
+from functools import lru_cache
+
+# Model name -> module. Every module exposes get_model() plus the batched
+# decode_features(path) / score_decoded(batch) pair used by scan.py.
+MODEL_MODULES = {
+    "zeroshot": "processors.image.zeroshot_model",
+    "cnn": "processors.image.cnn_model",
+    "rppg": "processors.video.rppg_model",
+    "lipsync": "processors.video.lipsync_model",
+    "audio": "processors.audio.audio_model",
+}
+
+MODALITY_MODELS = {
+    "image": ["zeroshot", "cnn"],
+    "video": ["rppg", "lipsync"],
+    "audio": ["audio"],
+}
+
+def load_module(name):
+    return importlib.import_module(MODEL_MODULES[name])
+
+def _file_stamp(path):
+    if not path or not os.path.exists(path):
+        return path
+    stat = os.stat(path)
+    return [os.path.basename(path), stat.st_size, int(stat.st_mtime)]
+
+@lru_cache(maxsize=None)
+def verdict_version(names, group=None):
+    """
+    Short fingerprint of everything behind a verdict of `names`: feature
+    versions, checkpoint files, scoring settings and the fusion config of
+    `group`. Cached verdicts (utils/near_duplicate.py) of another version are ignored.
+    """
+    parts = []
+    for name in sorted(names):
+        module = load_module(name)
+        parts.append([
+            name,
+            getattr(module, "FEATURE_VERSION", None),
+            getattr(module, "MODEL_NAME", None),
+            _file_stamp(getattr(module, "model_path", None)),
+            getattr(module, "SCORING_CONFIG", None),
+        ])
+    if group is not None:
+        from processors.ensemble import engine
+        parts.append(engine.config.get('groups', {}).get(group))
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+def preload_models(names=None):
+    # Models load lazily; the API server loads them up front so the first request is not slow
+    for name in names or MODEL_MODULES:
+        try:
+            load_module(name).get_model()
+        except Exception as e:
+            print(f"[WARN] Could not preload {name}: {e}")
+
+    # rPPG, lip-sync and the CNN share pooled MediaPipe graphs; build them before the first request too
+    if names is None or {"rppg", "lipsync", "cnn"} & set(names):
+        from utils.mediapipe_pool import warm_pools
+        warm_pools()
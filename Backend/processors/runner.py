@@ -0,0 +1,72 @@
+# File: processors/runner.py
+import queue
+import threading
+from processors.ensemble import engine
+
+
+def iter_model_events(models, call, group, progress=False, describe=None):
+    """
+    Run `models` ({name: func}) for fusion group `group` and yield (event, data)
+    pairs: one 'model' per finished model, plus 'progress' events. Models run
+    concurrently, or as a cheapest-first cascade when the group's fusion config
+    enables early exit.
+
+    Each model runs as `call(name, func)`, which returns (label, confidence,
+    reason); with `progress` it is `call(name, func, progress=callback)` and
+    the callback's reports are yielded as 'progress' events. `describe(name)`
+    adds fields to that model's 'model' event.
+
+    Use with `yield from`; returns (output, skipped) once every stage ran.
+    """
+    events = queue.Queue()
+    output = {}
+
+    def run_model(name, func):
+        def report(stage, **info):
+            events.put(('progress', {'model': name, 'stage': stage, **info}))
+
+        try:
+            label, confidence, reason = call(name, func, progress=report) if progress else call(name, func)
+            output[name] = {
+                'label': label,
+                'confidence': confidence,
+                'reason': reason
+            }
+        except Exception as e:
+            output[name] = {
+                'label': 'error',
+                'confidence': 0.0,
+                'reason': f'Exception: {str(e)}'
+            }
+        events.put(('model', name))
+
+    threads = []
+    # A disconnected stream closes the calling generator early; wait for the running models
+    # so the admission slot (released after close) is only freed once their work stops
+    try:
+        stages = engine.stages(group, list(models))
+        skipped = []
+        for i, stage in enumerate(stages):
+            for name in stage:
+                thread = threading.Thread(target=run_model, args=(name, models[name]), daemon=True)
+                thread.start()
+                threads.append(thread)
+
+            pending = len(stage)
+            while pending:
+                event, data = events.get()
+                if event == 'model':
+                    pending -= 1
+                    yield 'model', {'model': data, **(describe(data) if describe else {}), **output[data]}
+                else:
+                    yield event, data
+
+            # Cheap models already decisive: skip the expensive ones (e.g. PhysNet, CLIP ViT-H)
+            if i < len(stages) - 1 and engine.decisive(group, output):
+                skipped = [name for rest in stages[i + 1:] for name in rest]
+                yield 'progress', {'stage': 'early_exit', 'skipped': skipped}
+                break
+        return output, skipped
+    finally:
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,198 @@
+# File: processors/text/nli_engine.py
+
+import os
+import sys
+import json
+import time
+import argparse
+import torch
+import torch.nn as nn
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+# ======================
+# CONFIGURATION
+# ======================
+HF_TOKEN = os.getenv("HF_TOKEN")
+
+# "full" is the reference model; "fast" is a distilled MNLI model with the same label set
+NLI_MODELS = {
+    "full": "facebook/bart-large-mnli",
+    "fast": "valhalla/distilbart-mnli-12-3",
+}
+NLI_BATCH_SIZE = int(os.getenv("DG_NLI_BATCH_SIZE", "16"))
+
+
+def _label_id(config, name):
+    for label, idx in config.label2id.items():
+        if label.lower().startswith(name):
+            return idx
+    raise ValueError(f"Model config has no '{name}' label")
+
+
+class NLIEngine:
+    """
+    Drop-in replacement for the zero-shot-classification pipeline.
+
+    - Every (premise, hypothesis) pair of a call is scored in length-sorted,
+      padded batches instead of one forward pass per pair.
+    - Premises and hypotheses are tokenized once and the pair ids assembled
+      by hand, so a premise shared by several candidate labels is not
+      re-tokenized per label.
+    - On CPU the Linear layers can be dynamically quantized to int8.
+    """
+
+    def __init__(self, tier="full", quantize=False, device=None, batch_size=NLI_BATCH_SIZE, token=HF_TOKEN):
+        self.model_name = NLI_MODELS.get(tier, tier)
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.batch_size = batch_size
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, token=token)
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name, token=token)
+        model.eval()
+
+        # Dynamic int8 quantization only has CPU kernels
+        self.quantized = bool(quantize) and self.device.type == "cpu"
+        if self.quantized:
+            model = torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(self.device)
+
+        self.entailment_id = _label_id(model.config, "entail")
+        self.contradiction_id = _label_id(model.config, "contra")
+        self.max_length = min(self.tokenizer.model_max_length, 1024)
+        self.pair_special_tokens = self.tokenizer.num_special_tokens_to_add(pair=True)
+
+    def _pair_ids(self, premise_ids, hypothesis_ids):
+        # Same as the pipeline's truncation="only_first": trim the premise, never the hypothesis
+        room = self.max_length - self.pair_special_tokens - len(hypothesis_ids)
+        return self.tokenizer.build_inputs_with_special_tokens(premise_ids[:max(room, 0)], hypothesis_ids)
+
+    def _logits(self, pairs):
+        """Run [(premise_ids, hypothesis_ids)] through the model, returning one logits row per pair."""
+        inputs = [self._pair_ids(p, h) for p, h in pairs]
+        order = sorted(range(len(inputs)), key=lambda i: len(inputs[i]))
+        logits = [None] * len(inputs)
+        pad_id = self.tokenizer.pad_token_id
+
+        for start in range(0, len(order), self.batch_size):
+            bucket = order[start:start + self.batch_size]
+            width = max(len(inputs[i]) for i in bucket)
+            input_ids = torch.full((len(bucket), width), pad_id, dtype=torch.long)
+            attention_mask = torch.zeros((len(bucket), width), dtype=torch.long)
+            for row, i in enumerate(bucket):
+                input_ids[row, :len(inputs[i])] = torch.tensor(inputs[i])
+                attention_mask[row, :len(inputs[i])] = 1
+
+            with torch.inference_mode():
+                out = self.model(input_ids=input_ids.to(self.device),
+                                 attention_mask=attention_mask.to(self.device)).logits.float().cpu()
+            for row, i in enumerate(bucket):
+                logits[i] = out[row]
+        return logits
+
+    def __call__(self, sequences, candidate_labels, hypothesis_template="This example is {}.",
+                 multi_label=False):
+        single = isinstance(sequences, str)
+        if single:
+            sequences = [sequences]
+        if isinstance(candidate_labels, str):
+            candidate_labels = [candidate_labels]
+
+        hypotheses = [hypothesis_template.format(label) for label in candidate_labels]
+        premise_ids = self.tokenizer(sequences, add_special_tokens=False)['input_ids']
+        hypothesis_ids = self.tokenizer(hypotheses, add_special_tokens=False)['input_ids']
+
+        pairs = [(p, h) for p in premise_ids for h in hypothesis_ids]
+        logits = self._logits(pairs)
+
+        results = []
+        n = len(candidate_labels)
+        for i, sequence in enumerate(sequences):
+            rows = torch.stack(logits[i * n:(i + 1) * n])
+            if multi_label or n == 1:
+                # Entailment vs contradiction independently for each label
+                pair = rows[:, [self.contradiction_id, self.entailment_id]]
+                scores = pair.softmax(dim=1)[:, 1]
+            else:
+                # Softmax of the entailment logits across candidate labels
+                scores = rows[:, self.entailment_id].softmax(dim=0)
+            ranked = sorted(zip(candidate_labels, scores.tolist()), key=lambda x: x[1], reverse=True)
+            results.append({
+                'sequence': sequence,
+                'labels': [label for label, _ in ranked],
+                'scores': [score for _, score in ranked]
+            })
+        return results[0] if single else results
+
+
+# ======================
+# PARITY REPORT
+# ======================
+
+def parity_report(engine, reference, sequences, candidate_labels, hypothesis_template):
+    """
+    Compare `engine` against a reference zero-shot-classification pipeline.
+
+    Returns agreement on the top label, score deltas and timings.
+    """
+    started = time.perf_counter()
+    reference_results = [reference(seq, candidate_labels=candidate_labels, multi_label=False,
+                                   hypothesis_template=hypothesis_template) for seq in sequences]
+    reference_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    engine_results = engine(list(sequences), candidate_labels=candidate_labels,
+                            hypothesis_template=hypothesis_template)
+    engine_time = time.perf_counter() - started
+
+    agree = 0
+    deltas = []
+    disagreements = []
+    for seq, ref, ours in zip(sequences, reference_results, engine_results):
+        ref_scores = dict(zip(ref['labels'], ref['scores']))
+        our_scores = dict(zip(ours['labels'], ours['scores']))
+        deltas.extend(abs(ref_scores[label] - our_scores[label]) for label in candidate_labels)
+        if ref['labels'][0] == ours['labels'][0]:
+            agree += 1
+        else:
+            disagreements.append({
+                'sequence': seq[:200],
+                'reference': ref['labels'][0],
+                'engine': ours['labels'][0]
+            })
+
+    n = len(sequences)
+    return {
+        'engine_model': engine.model_name,
+        'quantized': engine.quantized,
+        'examples': n,
+        'top_label_agreement': round(agree / n, 4) if n else None,
+        'max_abs_score_diff': round(max(deltas), 4) if deltas else None,
+        'mean_abs_score_diff': round(sum(deltas) / len(deltas), 4) if deltas else None,
+        'reference_seconds': round(reference_time, 3),
+        'engine_seconds': round(engine_time, 3),
+        'speedup': round(reference_time / engine_time, 2) if engine_time else None,
+        'disagreements': disagreements
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python -m processors.text.nli_engine claims.txt [--tier fast] [--no-quantize]
+    from transformers import pipeline
+
+    parser = argparse.ArgumentParser(description="Parity report: NLIEngine vs the zero-shot pipeline")
+    parser.add_argument("input", help="Text file with one premise (claim + context) per line")
+    parser.add_argument("--tier", default="full", help="full, fast, or a Hugging Face model id")
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        premises = [line.strip() for line in f if line.strip()]
+
+    reference = pipeline("zero-shot-classification", model=NLI_MODELS["full"],
+                         device=0 if torch.cuda.is_available() else -1)
+    engine = NLIEngine(tier=args.tier, quantize=not args.no_quantize)
+
+    report = parity_report(engine, reference, premises, ["true", "false", "misleading"],
+                           "This statement is {}.")
+    json.dump(report, sys.stdout, indent=2)
+    print()
@@ -1,10 +1,11 @@
 import re
 import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, AutoModelForSequenceClassification, pipeline
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 from googleapiclient.discovery import build
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from processors.text.nli_engine import NLIEngine
 
 # ======================
 # CONFIGURATION
@@ -20,34 +21,123 @@ SEARCH_ENGINE_ID = os.getenv("SEARCH_ENGINE_ID")
 # LOAD MODELS
 # ======================
 
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+# Claim extraction runs flan-t5 directly (not through a pipeline) so many
+# sentence-aligned windows can share one batched generate call
+CLAIM_PROMPT = "Extract numbered factual claims from text. Text: "
+CLAIM_MAX_INPUT_TOKENS = 512   # flan-t5 context used during training
+CLAIM_MAX_NEW_TOKENS = 200
+CLAIM_BATCH_SIZE = int(os.getenv("DG_CLAIM_BATCH_SIZE", "8"))
+
 def get_claim_extractor():
     tokenizer = AutoTokenizer.from_pretrained("google/flan-t5-base", token=HF_TOKEN)
-    model = AutoModelForSeq2SeqLM.from_pretrained("google/flan-t5-base", token=HF_TOKEN)
-    return pipeline("text2text-generation", model=model, tokenizer=tokenizer, max_new_tokens=200)
+    model = AutoModelForSeq2SeqLM.from_pretrained("google/flan-t5-base", token=HF_TOKEN).to(device)
+    model.eval()
+    return tokenizer, model
+
+# NLI tier: "full" (bart-large-mnli) or "fast" (distilled); int8 quantization applies on CPU only.
+# Quantization is opt-in until a parity run against the pipeline's labels has been recorded:
+# `python -m processors.text.nli_engine <premises.txt>` reports top-label agreement and score deltas.
+NLI_TIER = os.getenv("DG_NLI_TIER", "full")
+NLI_QUANTIZE = os.getenv("DG_NLI_QUANTIZE", "0") == "1"
 
 def get_fact_checker():
-    tokenizer = AutoTokenizer.from_pretrained("facebook/bart-large-mnli", token=HF_TOKEN)
-    model = AutoModelForSequenceClassification.from_pretrained("facebook/bart-large-mnli", token=HF_TOKEN)
-    return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer,
-                    device=0 if torch.cuda.is_available() else -1)
+    # Same call signature and output as the zero-shot-classification pipeline
+    return NLIEngine(tier=NLI_TIER, quantize=NLI_QUANTIZE, token=HF_TOKEN)
 
-claim_extractor = get_claim_extractor()
+claim_tokenizer, claim_model = get_claim_extractor()
 fact_checker = get_fact_checker()
 
 # ======================
 # HELPER FUNCTIONS
 # ======================
 
-def extract_claims(text):
-    prompt = f"Extract numbered factual claims from text. Text: {text}"
-    result = claim_extractor(prompt)
-    claims_text = result[0]['generated_text']
+def parse_claims(claims_text):
     claims = []
     for line in claims_text.split('\n'):
         if re.match(r'\d+\.\s+', line):
             claims.append(line.split('.', 1)[1].strip())
     return claims or [claims_text.strip()]
 
+def split_into_windows(text, max_tokens=None):
+    """
+    Split an article into sentence-aligned windows that fit the claim
+    extractor's input after the prompt is prepended.
+    """
+    if max_tokens is None:
+        prompt_tokens = len(claim_tokenizer(CLAIM_PROMPT, add_special_tokens=False)['input_ids'])
+        max_tokens = CLAIM_MAX_INPUT_TOKENS - prompt_tokens - 1  # room for </s>
+
+    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+    if not sentences:
+        return []
+    lengths = [len(ids) for ids in claim_tokenizer(sentences, add_special_tokens=False)['input_ids']]
+
+    windows, current, current_len = [], [], 0
+    for sentence, length in zip(sentences, lengths):
+        if length > max_tokens:
+            # A single over-long sentence is cut on token boundaries
+            if current:
+                windows.append(" ".join(current))
+                current, current_len = [], 0
+            ids = claim_tokenizer(sentence, add_special_tokens=False)['input_ids']
+            for start in range(0, len(ids), max_tokens):
+                windows.append(claim_tokenizer.decode(ids[start:start + max_tokens], skip_special_tokens=True))
+            continue
+        if current_len + length > max_tokens:
+            windows.append(" ".join(current))
+            current, current_len = [], 0
+        current.append(sentence)
+        current_len += length
+    if current:
+        windows.append(" ".join(current))
+    return windows
+
+def _claim_key(claim):
+    return re.sub(r'[^a-z0-9 ]', '', claim.lower()).strip()
+
+def extract_claims_batch(texts):
+    """
+    Extract claims for many articles at once.
+
+    Every article is split into windows; all windows are sorted by length and
+    generated in padded buckets of CLAIM_BATCH_SIZE (KV cache on, greedy), then
+    claims are de-duplicated per article across its windows.
+    """
+    windows = []  # (article index, window text)
+    for i, text in enumerate(texts):
+        windows.extend((i, window) for window in split_into_windows(text))
+
+    prompts = [CLAIM_PROMPT + window for _, window in windows]
+    lengths = [len(ids) for ids in claim_tokenizer(prompts)['input_ids']] if prompts else []
+    order = sorted(range(len(prompts)), key=lambda j: lengths[j])
+
+    generated = [None] * len(prompts)
+    for start in range(0, len(order), CLAIM_BATCH_SIZE):
+        bucket = order[start:start + CLAIM_BATCH_SIZE]
+        inputs = claim_tokenizer([prompts[j] for j in bucket], return_tensors="pt", padding=True,
+                                 truncation=True, max_length=CLAIM_MAX_INPUT_TOKENS).to(device)
+        with torch.inference_mode():
+            output_ids = claim_model.generate(**inputs, max_new_tokens=CLAIM_MAX_NEW_TOKENS,
+                                              num_beams=1, do_sample=False, use_cache=True)
+        decoded = claim_tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+        for j, claims_text in zip(bucket, decoded):
+            generated[j] = claims_text
+
+    results = [[] for _ in texts]
+    seen = [set() for _ in texts]
+    for (i, _), claims_text in zip(windows, generated):
+        for claim in parse_claims(claims_text):
+            key = _claim_key(claim)
+            if key and key not in seen[i]:
+                seen[i].add(key)
+                results[i].append(claim)
+    return [claims or [""] for claims in results]
+
+def extract_claims(text):
+    return extract_claims_batch([text])[0]
+
 def get_search_context(query, num_results=2):
     try:
         service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY)
@@ -113,7 +203,7 @@ def text_fakenews_process(article_text):
 # VERBOSE TEXT OUTPUT (PRINT-STYLE LOG)
 # ======================
 
-def text_fakenews_process(article_text):
+def fact_check_claims(claims):
     """
     Returns:
         label (str): 'real', 'fake', or 'unknown'
@@ -121,14 +211,13 @@ def text_fakenews_process(article_text):
         sources (list): list of source dicts {'link': ..., 'snippet': ...}
     """
     try:
-        claims = extract_claims(article_text)
-
         if not claims or (len(claims) == 1 and claims[0].strip() == ""):
             return "unknown", 0.0, []
 
         label_scores = {"true": 0, "false": 0, "misleading": 0}
         confidence_total = 0.0
         collected_sources = []
+        input_texts = []
 
         for claim in claims:
             service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY)
@@ -143,15 +232,17 @@ def text_fakenews_process(article_text):
                     'snippet': item.get('snippet', '')
                 })
 
-            input_text = f"Claim: {claim}\nContext: {context[:500]}"
+            input_texts.append(f"Claim: {claim}\nContext: {context[:500]}")
 
-            result = fact_checker(
-                input_text,
-                candidate_labels=["true", "false", "misleading"],
-                multi_label=False,
-                hypothesis_template="This statement is {}."
-            )
+        # All claims x candidate labels are scored in one padded, batched pass
+        results = fact_checker(
+            input_texts,
+            candidate_labels=["true", "false", "misleading"],
+            multi_label=False,
+            hypothesis_template="This statement is {}."
+        )
 
+        for result in results:
             top_label = result["labels"][0]
             confidence = result["scores"][0]
 
@@ -168,6 +259,21 @@ def text_fakenews_process(article_text):
     except Exception as e:
         return "unknown", 0.0, [{"error": str(e)}]
 
+def text_fakenews_process(article_text):
+    try:
+        claims = extract_claims(article_text)
+    except Exception as e:
+        return "unknown", 0.0, [{"error": str(e)}]
+    return fact_check_claims(claims)
+
+def text_fakenews_process_batch(articles):
+    """Batched variant of text_fakenews_process: one (label, confidence, sources) per article."""
+    try:
+        claims_per_article = extract_claims_batch(articles)
+    except Exception as e:
+        return [("unknown", 0.0, [{"error": str(e)}]) for _ in articles]
+    return [fact_check_claims(claims) for claims in claims_per_article]
+
 
 # ======================
 # EXAMPLE USAGE
@@ -1,6 +1,6 @@
 # File: processors/text/text_processor.py
 
-from processors.text.text_model import text_fakenews_process
+from processors.text.text_model import text_fakenews_process, text_fakenews_process_batch
 
 def process_text(text):
     """
@@ -24,3 +24,21 @@ def process_text(text):
             'sources': sources
         }
     }
+
+def process_text_batch(texts):
+    """
+    Run fake news detection on many articles through one batched claim-extraction pass.
+
+    Returns:
+        list: one process_text-style dict per input text, in order
+    """
+    return [
+        {
+            'text_model': {
+                'label': label,
+                'confidence': confidence,
+                'sources': sources
+            }
+        }
+        for label, confidence, sources in text_fakenews_process_batch(texts)
+    ]
@@ -1,11 +1,15 @@
 import os
+import threading
 import cv2
 import numpy as np
 import torch
 import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence
 import librosa
-from moviepy.editor import VideoFileClip
-import mediapipe as mp
+from utils.feature_store import get_or_extract, detached
+from utils.media import read_frames, video_fps, extract_audio_track, load_audio_track
+from utils.mediapipe_pool import face_mesh_pool
+from utils.checkpoints import load_weights
 
 # ------------------------------
 # Define model (must match training)
@@ -22,115 +26,292 @@ class LipSyncLSTMClassifier(nn.Module):
             nn.Linear(128, 2)
         )
 
-    def forward(self, lips, audio):
+    def forward(self, lips, audio, lip_lengths=None, audio_lengths=None):
+        # Zero-padded batches pass their real lengths, so padding never reaches the final hidden state
         B = lips.shape[0]
-        lips = lips.view(B, 150, -1)
-        _, (h_lip, _) = self.lip_lstm(lips)
-        _, (h_audio, _) = self.audio_lstm(audio)
-        fused = torch.cat([h_lip[-1], h_audio[-1]], dim=1)
+        lips = lips.reshape(B, lips.shape[1], -1)
+        h_lip = self._last_hidden(self.lip_lstm, lips, lip_lengths)
+        h_audio = self._last_hidden(self.audio_lstm, audio, audio_lengths)
+        fused = torch.cat([h_lip, h_audio], dim=1)
         return self.fc(fused)
 
+    @staticmethod
+    def _last_hidden(lstm, x, lengths):
+        if lengths is not None:
+            x = pack_padded_sequence(x, lengths.clamp(min=1).cpu(), batch_first=True, enforce_sorted=False)
+        _, (h, _) = lstm(x)
+        return h[-1]
+
+# ------------------------------
+# Windowing
+# ------------------------------
+# The model was trained on 150-frame clips. Long videos are scored as several
+# 150-frame windows, WINDOW_STRIDE frames apart, in a single forward pass.
+WINDOW = 150
+WINDOW_STRIDE = int(os.getenv("DG_LIPSYNC_WINDOW_STRIDE", "75"))
+MAX_WINDOWS = int(os.getenv("DG_LIPSYNC_MAX_WINDOWS", "8"))
+MAX_FRAMES = WINDOW + WINDOW_STRIDE * (MAX_WINDOWS - 1)
+# "mean" or "max" of the window fake probabilities decides the video's label
+AGGREGATE = os.getenv("DG_LIPSYNC_AGGREGATE", "mean")
+MFCC_HOP = 512  # librosa's default hop length
+SCORING_CONFIG = {'stride': WINDOW_STRIDE, 'max_windows': MAX_WINDOWS, 'aggregate': AGGREGATE}
+
 # ------------------------------
 # Lip landmarks
 # ------------------------------
-mp_face_mesh = mp.solutions.face_mesh
 lip_landmarks = list(range(61, 81))
+# Forehead, chin and both cheeks: enough to bound the face for the next frame's crop
+face_bound_landmarks = [10, 152, 234, 454]
+ROI_MARGIN = 0.25
+
+def _face_roi(face_landmarks, roi, frame_shape):
+    # Bounding box (pixels) of the tracked face, expanded by ROI_MARGIN on each side
+    h, w = frame_shape[:2]
+    x0, y0, sx, sy = roi
+    xs = [x0 + face_landmarks.landmark[i].x * sx for i in face_bound_landmarks]
+    ys = [y0 + face_landmarks.landmark[i].y * sy for i in face_bound_landmarks]
+    mx = (max(xs) - min(xs)) * ROI_MARGIN
+    my = (max(ys) - min(ys)) * ROI_MARGIN
+    left, right = int(max(min(xs) - mx, 0)), int(min(max(xs) + mx, w))
+    top, bottom = int(max(min(ys) - my, 0)), int(min(max(ys) + my, h))
+    if right - left < 32 or bottom - top < 32:
+        return None
+    return left, top, right, bottom
 
-def extract_lip_landmarks(video_path, max_frames=150):
-    cap = cv2.VideoCapture(video_path)
-    lips = []
+def lip_landmarks_from_frames(frames, max_frames=MAX_FRAMES):
+    """
+    Lip landmarks of the first `max_frames` frames as (lips [N, 40], frame
+    indices [N]); frames without a detected face are left out.
+    """
+    # Landmarks are written straight into preallocated buffers
+    lips = np.zeros((max_frames, 2 * len(lip_landmarks)), dtype=np.float32)
+    lip_frames = np.zeros(max_frames, dtype=np.int32)
+    n = 0
+    crop = None  # (left, top, right, bottom) of the tracked face, once found
 
-    with mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1) as face_mesh:
-        while len(lips) < max_frames:
-            ret, frame = cap.read()
-            if not ret:
+    # Pooled graph, reset between videos (see utils/mediapipe_pool.py)
+    with face_mesh_pool.checkout() as face_mesh:
+        for index, frame in enumerate(frames):
+            if index >= max_frames:
                 break
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = face_mesh.process(rgb)
-            if results.multi_face_landmarks:
-                for face_landmarks in results.multi_face_landmarks:
-                    points = []
-                    for idx in lip_landmarks:
-                        lm = face_landmarks.landmark[idx]
-                        points.extend([lm.x, lm.y])
-                    lips.append(points)
-                    break
-    cap.release()
-
-    if len(lips) == 0:
+            h, w = frame.shape[:2]
+
+            # Run FaceMesh on the face crop once tracked; fall back to the full frame if it is lost
+            results = None
+            if crop is not None:
+                left, top, right, bottom = crop
+                rgb = cv2.cvtColor(frame[top:bottom, left:right], cv2.COLOR_BGR2RGB)
+                results = face_mesh.process(rgb)
+                roi = (left, top, right - left, bottom - top)
+            if results is None or not results.multi_face_landmarks:
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                results = face_mesh.process(rgb)
+                roi = (0, 0, w, h)
+            if not results.multi_face_landmarks:
+                crop = None
+                continue
+
+            # Map crop-relative normalized coordinates back to the full frame
+            face_landmarks = results.multi_face_landmarks[0]
+            points = face_landmarks.landmark
+            x0, y0, sx, sy = roi
+            lips[n, 0::2] = [points[i].x for i in lip_landmarks]
+            lips[n, 1::2] = [points[i].y for i in lip_landmarks]
+            lips[n, 0::2] = (lips[n, 0::2] * sx + x0) / w
+            lips[n, 1::2] = (lips[n, 1::2] * sy + y0) / h
+            lip_frames[n] = index
+            n += 1
+
+            crop = _face_roi(face_landmarks, roi, frame.shape)
+
+    if n == 0:
         return None  # failure case
+    return lips[:n], lip_frames[:n]
 
-    lips = np.array(lips)
-    if len(lips) < max_frames:
-        pad = np.zeros((max_frames - len(lips), 40))
-        lips = np.vstack([lips, pad])
-    else:
-        lips = lips[:max_frames]
-    return lips  # [150, 40]
+def extract_lip_landmarks(video_path, max_frames=MAX_FRAMES):
+    frames = read_frames(video_path)
+    try:
+        return lip_landmarks_from_frames(frames, max_frames)
+    finally:
+        frames.close()
 
 # ------------------------------
 # Audio feature extraction
 # ------------------------------
-def extract_audio_from_video(video_path, temp_wav_path="temp.wav"):
-    try:
-        clip = VideoFileClip(video_path)
-        clip.audio.write_audiofile(temp_wav_path, verbose=False, logger=None)
-        return temp_wav_path
-    except Exception as e:
-        print(f"[ERROR] Audio extract failed: {e}")
-        return None
+def extract_audio_from_video(video_path, temp_wav_path=None):
+    return extract_audio_track(video_path, temp_wav_path)
+
+def mfcc_from_signal(y, sr, span_seconds=None):
+    """
+    Unpadded MFCC sequence [A, 13] and its frame rate (frames per second).
+    With `span_seconds`, only the audio a window starting inside that span can reach is used.
+    """
+    if span_seconds is not None:
+        y = y[:int(span_seconds * sr) + WINDOW * MFCC_HOP]
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13, hop_length=MFCC_HOP)
+    return mfcc.T.astype(np.float32), sr / MFCC_HOP
 
-def extract_audio_features(video_path, max_frames=150):
-    temp_wav_path = extract_audio_from_video(video_path)
-    if temp_wav_path is None:
+def extract_audio_features(video_path, span_seconds=None):
+    track = load_audio_track(video_path)
+    if track is None:
         return None
+    y, sr = track
+    return mfcc_from_signal(y, sr, span_seconds)
+
+# ------------------------------
+# Feature store
+# ------------------------------
+# Landmarks and MFCCs are stored per video content hash, so re-scoring after a
+# model update skips decoding and FaceMesh entirely. Bump FEATURE_VERSION
+# whenever extraction changes.
+# Version 2 stores unpadded sequences plus timing, so windows can be cut and
+# aligned at scoring time.
+FEATURE_EXTRACTOR = "lipsync"
+FEATURE_VERSION = 2
+
+def build_features(lips, lip_frames, fps, audio, mfcc_rate):
+    return {
+        'lips': lips,               # [N, 40] landmarks of the frames with a face
+        'lip_frames': lip_frames,   # [N] index of each landmark row in the video
+        'audio': audio,             # [A, 13] MFCCs
+        'timing': np.array([fps, mfcc_rate], dtype=np.float64)
+    }
+
+def extract_features(video_path, progress=None):
+    landmarks = extract_lip_landmarks(video_path)
+    if landmarks is None:
+        raise ValueError("Lip landmarks could not be extracted")
+    lips, lip_frames = landmarks
+    if progress:
+        progress("landmarks_extracted", frames=len(lips))
 
-    y, sr = librosa.load(temp_wav_path, sr=None)
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    mfcc = mfcc.T
+    fps = video_fps(video_path)
+    track = extract_audio_features(video_path, span_seconds=(lip_frames[-1] + 1) / fps)
+    if track is None:
+        raise ValueError("Audio features could not be extracted")
+    audio, mfcc_rate = track
+    if progress:
+        progress("audio_extracted")
 
-    if len(mfcc) < max_frames:
-        pad = np.zeros((max_frames - len(mfcc), 13))
-        mfcc = np.vstack([mfcc, pad])
-    else:
-        mfcc = mfcc[:max_frames]
-    return mfcc  # [150, 13]
+    return build_features(lips, lip_frames, fps, audio, mfcc_rate)
+
+def load_features(video_path, progress=None):
+    return get_or_extract(FEATURE_EXTRACTOR, FEATURE_VERSION, video_path,
+                          lambda path: extract_features(path, progress=progress), progress=progress)
 
 # ------------------------------
-# Main process to be called from backend
+# Scoring head
 # ------------------------------
-def lipsync_process(video_path):
-    try:
-        # Load model
-        model = LipSyncLSTMClassifier()
-        model_path = os.path.join(os.path.dirname(__file__), "models", "lipsync_deepfake_model.pth")
-        model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
-        model.eval()
-
-        # Feature extraction
-        lips = extract_lip_landmarks(video_path)
-        if lips is None:
-            return "error", 0.0, "Lip landmarks could not be extracted"
-
-        audio = extract_audio_features(video_path)
-        if audio is None:
-            return "error", 0.0, "Audio features could not be extracted"
-
-        lips_tensor = torch.tensor(lips, dtype=torch.float32).unsqueeze(0)   # [1, 150, 40]
-        audio_tensor = torch.tensor(audio, dtype=torch.float32).unsqueeze(0) # [1, 150, 13]
-
-        with torch.no_grad():
-            output = model(lips_tensor, audio_tensor)
-            probs = torch.softmax(output, dim=1)
-            pred = torch.argmax(probs, dim=1).item()
-            conf = probs[0, pred].item()
-
-        label = "real" if pred == 0 else "fake"
+model_path = os.path.join(os.path.dirname(__file__), "models", "lipsync_deepfake_model.pth")
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            model = LipSyncLSTMClassifier()
+            load_weights(model, model_path, "cpu", name="lipsync")
+            model.eval()
+            _model = model
+    return _model
+
+def feature_windows(features, window=WINDOW, stride=WINDOW_STRIDE, max_windows=MAX_WINDOWS):
+    """
+    Cut a video's features into up to `max_windows` windows of `window`
+    landmark rows. Each window's MFCCs start at the same timestamp as its
+    first frame; like the training clips, it takes `window` MFCC frames.
+    """
+    lips, lip_frames, audio = features['lips'], features['lip_frames'], features['audio']
+    fps, mfcc_rate = features['timing']
+    n = len(lips)
+
+    starts = list(range(0, max(n - window, 0) + 1, stride))[:max_windows]
+    if n > window and starts[-1] + window < n and len(starts) < max_windows:
+        starts.append(n - window)  # cover the tail the stride stepped over
+
+    windows = []
+    for start in starts:
+        end = min(start + window, n)
+        t0 = lip_frames[start] / fps
+        a0 = int(round(t0 * mfcc_rate))
+        if a0 >= len(audio):
+            continue  # the audio track ends before this window
+        windows.append({
+            'lips': lips[start:end],
+            'audio': audio[a0:a0 + window],
+            'start': round(float(t0), 2),
+            'end': round(float((lip_frames[end - 1] + 1) / fps), 2)
+        })
+    return windows
+
+def _pad(sequences, dim):
+    # Zero-padded [B, T, dim] batch plus the real length of each sequence
+    lengths = torch.tensor([len(s) for s in sequences])
+    batch = torch.zeros(len(sequences), int(lengths.max()), dim)
+    for i, s in enumerate(sequences):
+        batch[i, :len(s)] = torch.as_tensor(np.asarray(s, dtype=np.float32))
+    return batch, lengths
+
+def score_windows(windows):
+    """P(fake) of every window, from one packed forward pass."""
+    lips, lip_lengths = _pad([w['lips'] for w in windows], 2 * len(lip_landmarks))
+    audio, audio_lengths = _pad([w['audio'] for w in windows], 13)
+    with torch.inference_mode():
+        probs = torch.softmax(get_model()(lips, audio, lip_lengths, audio_lengths), dim=1)
+    return probs[:, 1].tolist()  # class 0 is real, 1 is fake
+
+def score_features(batch):
+    """
+    Score a list of feature dicts (see build_features). The windows of every
+    video in the batch go through the model together; each verdict's reason
+    lists the per-window fake probabilities for localization.
+    """
+    per_video = [feature_windows(f) for f in batch]
+    flat = [w for windows in per_video for w in windows]
+    probs = score_windows(flat) if flat else []
+
+    results = []
+    offset = 0
+    for windows in per_video:
+        if not windows:
+            results.append(("error", 0.0, "No audio overlaps the detected lip movement"))
+            continue
+        window_probs = probs[offset:offset + len(windows)]
+        offset += len(windows)
+
+        fake_prob = max(window_probs) if AGGREGATE == "max" else float(np.mean(window_probs))
+        label = "fake" if fake_prob > 0.5 else "real"
+        conf = fake_prob if label == "fake" else 1 - fake_prob
         if label == "fake":
-            reason = "voice and lip sync mismatch detected"
+            summary = "voice and lip sync mismatch detected"
         else:
-            reason = "synchronized lip movement with audio"
-        return label, conf, reason
+            summary = "synchronized lip movement with audio"
+        results.append((label, conf, {
+            'summary': summary,
+            'windows': [{'start': w['start'], 'end': w['end'], 'fake_probability': round(p, 4)}
+                        for w, p in zip(windows, window_probs)]
+        }))
+    return results
+
+# Bulk scanning (see scan.py): decode in worker processes, score in batches
+def decode_features(video_path):
+    return detached(load_features(video_path))
+
+score_decoded = score_features
+
+# ------------------------------
+# Main process to be called from backend
+# ------------------------------
+def lipsync_process(video_path, progress=None):
+    try:
+        # Feature extraction (read from the feature store when this video was seen before)
+        try:
+            features = load_features(video_path, progress=progress)
+        except ValueError as e:
+            return "error", 0.0, str(e)
+
+        return score_features([features])[0]
 
     except Exception as e:
         return "error", 0.0, f"Error: {str(e)}"
@@ -1,14 +1,18 @@
 # File: processors/video/rppg_model.py
 
 import os
+import threading
 import cv2
 import torch
-import mediapipe as mp
 import numpy as np
 from scipy.signal import find_peaks
 from collections import deque
 from torch import nn
 import torch.nn.functional as F
+from utils.feature_store import get_or_extract, detached
+from utils.media import read_frames
+from utils.mediapipe_pool import face_detection_pool
+from utils.checkpoints import load_weights
 
 # -----------------------------
 # Define PhysNet3D Architecture
@@ -66,18 +70,26 @@ class PhysNet3D(nn.Module):
 # -----------------------------
 device = "cuda" if torch.cuda.is_available() else "cpu"
 model_path = os.path.join(os.path.dirname(__file__), "models", "physnet_ubfc.pth")
-model = PhysNet3D().to(device)
-model.load_state_dict(torch.load(model_path, map_location=device))
-model.eval()
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    # Loaded on first use so CPU-only decoders (scan.py) never pay for PhysNet
+    global _model
+    with _model_lock:
+        if _model is None:
+            model = PhysNet3D().to(device)
+            load_weights(model, model_path, device, name="rppg")
+            model.eval()
+            _model = model
+    return _model
 
 # -----------------------------
-# MediaPipe Setup
+# Face cropping
 # -----------------------------
-mp_face = mp.solutions.face_detection
-face_detector = mp_face.FaceDetection(model_selection=0, min_detection_confidence=0.7)
-
-
-def crop_face(frame):
+# FaceDetection graphs come from a shared pool (utils/mediapipe_pool.py): one
+# per running video, so concurrent requests never share a graph.
+def crop_face(frame, face_detector):
     results = face_detector.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
     if results.detections:
         box = results.detections[0].location_data.relative_bounding_box
@@ -90,23 +102,24 @@ def crop_face(frame):
     return None
 
 
-def extract_valid_clip(video_path, clip_len=150, size=(72, 72)):
-    cap = cv2.VideoCapture(video_path)
+def face_clip_from_frames(frames, clip_len=150, size=(72, 72), progress=None):
+    """Best run of `clip_len` consecutive face crops, as uint8 (T, H, W, 3)."""
     faces, areas = [], []
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret: break
-        face = crop_face(frame)
-        if face is not None:
-            resized = cv2.resize(face, size) / 255.0
-            faces.append(resized)
-            areas.append(face.shape[0] * face.shape[1])
-        else:
-            faces.append(None)
-            areas.append(0)
-
-    cap.release()
+    with face_detection_pool.checkout() as face_detector:
+        for frame in frames:
+            face = crop_face(frame, face_detector)
+            if face is not None:
+                faces.append(cv2.resize(face, size))  # kept as uint8; scaled to [0, 1] at scoring
+                areas.append(face.shape[0] * face.shape[1])
+            else:
+                faces.append(None)
+                areas.append(0)
+            if progress and len(faces) % 30 == 0:
+                progress("frames_decoded", frames=len(faces))
+
+    if progress:
+        progress("frames_decoded", frames=len(faces), done=True)
 
     best_start = -1
     max_area = 0
@@ -119,10 +132,25 @@ def extract_valid_clip(video_path, clip_len=150, size=(72, 72)):
 
     if best_start == -1:
         raise ValueError("No valid clip found.")
+    if progress:
+        progress("clip_found", start_frame=best_start, length=clip_len)
+
+    return np.stack(faces[best_start:best_start + clip_len])
+
+
+def extract_face_clip(video_path, clip_len=150, size=(72, 72), progress=None):
+    return face_clip_from_frames(read_frames(video_path), clip_len=clip_len, size=size, progress=progress)
 
-    selected = np.stack(faces[best_start:best_start + clip_len])
-    tensor = torch.tensor(selected).permute(3, 0, 1, 2).unsqueeze(0).float().to(device)
-    return tensor
+
+def clips_to_tensor(clips):
+    # [B, T, H, W, 3] uint8 -> [B, 3, T, H, W] float in [0, 1]
+    batch = torch.tensor(np.stack(clips)).float().div_(255.0)
+    return batch.permute(0, 4, 1, 2, 3).to(device)
+
+
+def extract_valid_clip(video_path, clip_len=150, size=(72, 72), progress=None):
+    clip = extract_face_clip(video_path, clip_len=clip_len, size=size, progress=progress)
+    return clips_to_tensor([clip])
 
 
 def estimate_bpm(bvp, fps=30):
@@ -134,11 +162,28 @@ def estimate_bpm(bvp, fps=30):
     return 60.0 / np.mean(intervals)
 
 
-def rppg_process(video_path):
-    try:
-        clip = extract_valid_clip(video_path)
-        with torch.no_grad():
-            bvp = model(clip)
+# -----------------------------
+# Feature store
+# -----------------------------
+FEATURE_EXTRACTOR = "rppg"
+FEATURE_VERSION = 1
+
+def extract_features(video_path, progress=None):
+    return {'clip': extract_face_clip(video_path, progress=progress)}
+
+
+def load_features(video_path, progress=None):
+    return get_or_extract(FEATURE_EXTRACTOR, FEATURE_VERSION, video_path,
+                          lambda path: extract_features(path, progress=progress), progress=progress)
+
+
+def score_features(batch):
+    """Run PhysNet on a list of feature dicts ({'clip'}) in one forward pass."""
+    with torch.no_grad():
+        bvps = get_model()(clips_to_tensor([f['clip'] for f in batch]))
+
+    results = []
+    for bvp in bvps:
         bpm = estimate_bpm(bvp)
         power = np.mean(np.abs(bvp.cpu().numpy()))
 
@@ -149,6 +194,21 @@ def rppg_process(video_path):
             label = "real"
             reason = f"Realistic BPM signals"
 
-        return label, float(np.clip(bpm/120, 0, 1)), reason
+        results.append((label, float(np.clip(bpm/120, 0, 1)), reason))
+    return results
+
+
+# Bulk scanning (see scan.py): decode in worker processes, score in batches
+def decode_features(video_path):
+    return detached(load_features(video_path))
+
+
+score_decoded = score_features
+
+
+def rppg_process(video_path, progress=None):
+    try:
+        features = load_features(video_path, progress=progress)
+        return score_features([features])[0]
     except Exception as e:
         return "unknown", 0.0, f"RPPG Error: {str(e)}"
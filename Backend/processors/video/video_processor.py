@@ -1,58 +1,47 @@
 # File: processors/video/video_processor.py
-import threading
+import os
 from processors.video.rppg_model import rppg_process
 from processors.video.lipsync_model import lipsync_process
+from processors.ensemble import engine
+from processors.runner import iter_model_events
+from processors.registry import verdict_version
+from utils.near_duplicate import lookup_media, remember_media
  # Add other models similarly
 
-def process_video(video_path):
-    results = {}
-
-    def run_model(name, func, output_dict):
-        label, confidence, reason = func(video_path)
-        output_dict[name] = {
-            'label': label,
-            'confidence': confidence,
-            'reason': reason
-        }
-
-    threads = []
-    output = {}
-
-    models = {
-        "rppg": rppg_process,
-        "lipsync": lipsync_process,
-        # Add more models here
-    }
-
-    for name, func in models.items():
-        t = threading.Thread(target=run_model, args=(name, func, output))
-        threads.append(t)
-        t.start()
-
-    for t in threads:
-        t.join()
-
-    # Determine overall label based on consensus or priority
-    fake_votes = [m for m in output if output[m]['label'].lower() == 'fake']
-    real_votes = [m for m in output if output[m]['label'].lower() == 'real']
-
-    if len(fake_votes) > len(real_votes):
-        overall_label = "fake"
-    else:
-        overall_label = "real"
-
-    results['overall'] = {
-        'label': overall_label,
-        'model_confidences': {
-            model: {
-                'label': info['label'],
-                'confidence': info['confidence'],
-                'reason': info['reason']
-            } for model, info in output.items()
-        },
-        'fake_by': fake_votes,
-        'real_by': real_votes
+models = {
+    "rppg": rppg_process,
+    "lipsync": lipsync_process,
+    # Add more models here
+}
+
+def iter_video_events(video_path, force=False):
+    """
+    Run the video models and yield (event, data) pairs as they happen: 'progress'
+    while models decode, one 'model' per finished model, then 'overall'. Models
+    run concurrently, or as a cheapest-first cascade when early exit is configured.
+    """
+    # Keyframe hashes catch re-encoded or resized copies of a known video
+    version = verdict_version(tuple(models), "video")
+    hashes, cached = lookup_media("video", video_path, version)
+    if cached is not None and not force:
+        yield 'overall', cached
+        return
+
+    def call(name, func, progress):
+        return func(video_path, progress=progress)
+
+    yield 'progress', {'stage': 'started', 'models': list(models)}
+    output, skipped = yield from iter_model_events(models, call, "video", progress=True)
+
+    # Calibrated, weighted fusion of the model verdicts
+    results = {
+        'overall': engine.fuse("video", output, skipped=skipped),
+        'video_models': output
     }
+    yield 'overall', remember_media("video", hashes, results, output, version,
+                                  source=os.path.basename(video_path))
 
-    results['video_models'] = output
-    return results
+def process_video(video_path, force=False):
+    for event, data in iter_video_events(video_path, force=force):
+        if event == 'overall':
+            return data
@@ -0,0 +1,73 @@
+# File: rescore.py
+#
+# Re-run model heads over features already in the feature store, without
+# decoding any media. Useful after a model or threshold update:
+#
+#   python rescore.py lipsync --out lipsync_rescored.jsonl
+#   python rescore.py zeroshot rppg audio --batch-size 64
+
+import sys
+import json
+import time
+import argparse
+from processors.registry import load_module
+from utils.feature_store import store
+
+# Models whose features live in the feature store
+HEADS = ["lipsync", "rppg", "audio", "zeroshot"]
+
+
+def rescore(name, batch_size, out):
+    # Imported lazily so re-scoring one head never loads the others' models
+    module = load_module(name)
+    entries = store.entries(module.FEATURE_EXTRACTOR, module.FEATURE_VERSION)
+
+    count = 0
+    started = time.perf_counter()
+
+    def flush(batch):
+        results = module.score_features([arrays for _, _, arrays in batch])
+        for (content_hash, meta, _), (label, confidence, reason) in zip(batch, results):
+            out.write(json.dumps({
+                'model': name,
+                'content_hash': content_hash,
+                'source': meta.get('source'),
+                'label': label,
+                'confidence': confidence,
+                'reason': reason
+            }, default=str) + "\n")
+
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == batch_size:
+            flush(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        flush(batch)
+        count += len(batch)
+
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else 0.0
+    print(f"[{name}] re-scored {count} inputs in {elapsed:.1f}s ({rate:.1f}/s)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored features with the current model heads")
+    parser.add_argument("heads", nargs="+", choices=sorted(HEADS))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--out", help="JSONL output file (default: stdout)")
+    args = parser.parse_args()
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for name in args.heads:
+            rescore(name, args.batch_size, out)
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
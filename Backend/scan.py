@@ -0,0 +1,342 @@
+# File: scan.py
+#
+# Bulk offline scanner: analyse a directory tree (or a manifest of paths)
+# without going through the HTTP API.
+#
+#   python scan.py /data/archive --out results.jsonl
+#   python scan.py --manifest files.txt --out results.parquet --workers 8
+#
+# Files are routed by extension to the image / video / audio models. Decoding
+# and feature extraction run in a process pool; each model scores the decoded
+# inputs in batches on its own inference thread. Completed paths are appended
+# to <out>.checkpoint once their results are on disk, so an interrupted run
+# resumes where it stopped. Parquet output is written as closed part files
+# (<stem>.part<N>.parquet), one per flush.
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from processors.registry import MODALITY_MODELS, load_module
+from processors.ensemble import engine
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+VIDEO_EXTS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v"}
+AUDIO_EXTS = {".wav", ".mp3", ".flac", ".ogg", ".m4a", ".aac"}
+
+
+def media_kind(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in IMAGE_EXTS:
+        return "image"
+    if ext in VIDEO_EXTS:
+        return "video"
+    if ext in AUDIO_EXTS:
+        return "audio"
+    return None
+
+
+def iter_inputs(root=None, manifest=None):
+    if manifest:
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                path = line.strip()
+                if path and not path.startswith("#"):
+                    yield path
+    else:
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                yield os.path.join(dirpath, filename)
+
+
+# -----------------------------
+# Decode stage (worker processes)
+# -----------------------------
+def decode_file(kind, path):
+    """CPU-side feature extraction for every model of `kind`; errors are returned, not raised."""
+    decoded = {}
+    for name in MODALITY_MODELS[kind]:
+        try:
+            decoded[name] = load_module(name).decode_features(path)
+        except Exception as e:
+            decoded[name] = {'__error__': str(e)}
+    return decoded
+
+
+# -----------------------------
+# Inference stage (one batching thread per model)
+# -----------------------------
+_STOP = object()
+
+
+class BatchWorker(threading.Thread):
+    def __init__(self, name, batch_size, results, max_wait=0.5):
+        super().__init__(daemon=True)
+        self.name = name
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.inbox = queue.Queue(maxsize=batch_size * 4)
+        self.results = results
+
+    def run(self):
+        try:
+            module = load_module(self.name)
+        except Exception as e:
+            module, self.load_error = None, e
+        stopping = False
+        while not stopping:
+            item = self.inbox.get()
+            if item is _STOP:
+                break
+            batch = [item]
+
+            # Fill the batch, but never hold inputs back longer than max_wait
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.inbox.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._score(module, batch)
+
+    def _score(self, module, batch):
+        try:
+            if module is None:
+                raise self.load_error
+            outputs = module.score_decoded([features for _, features in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # Re-score one by one so a single bad input does not fail the batch
+                for item in batch:
+                    self._score(module, [item])
+                return
+            outputs = [('error', 0.0, f'Exception: {str(e)}')]
+
+        for (path, _), (label, confidence, reason) in zip(batch, outputs):
+            self.results.put((path, self.name, {
+                'label': label,
+                'confidence': confidence,
+                'reason': reason
+            }))
+
+
+# -----------------------------
+# Output
+# -----------------------------
+class ResultWriter:
+    def __init__(self, out_path):
+        self.out_path = out_path
+        self.checkpoint_path = f"{out_path}.checkpoint"
+        self.done = set()
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+
+        self.parquet = out_path.endswith(".parquet")
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._pa, self._pq = pa, pq
+            # Parquet files cannot be appended to, and one left open is unreadable
+            # after a crash: every flush is its own closed part file instead
+            self._stem, self._ext = os.path.splitext(out_path)
+            self._part = 1
+            while os.path.exists(self._part_path(self._part)):
+                self._part += 1
+            self._rows = []
+        else:
+            self._out = open(out_path, "a", encoding="utf-8")
+        self._checkpoint = open(self.checkpoint_path, "a", encoding="utf-8")
+
+    def write(self, path, kind, result):
+        if self.parquet:
+            self._rows.append({
+                'path': path,
+                'kind': kind,
+                'label': result.get('overall', result).get('label'),
+                'result': json.dumps(result, default=str)
+            })
+            if len(self._rows) >= 1000:
+                self._flush_parquet()
+        else:
+            self._out.write(json.dumps({'path': path, 'kind': kind, 'result': result}, default=str) + "\n")
+            self._out.flush()
+            self._mark_done([path])
+
+    def _mark_done(self, paths):
+        # Only called once the paths' results are on disk
+        self._checkpoint.write("".join(path + "\n" for path in paths))
+        self._checkpoint.flush()
+
+    def _part_path(self, part):
+        return f"{self._stem}.part{part}{self._ext}"
+
+    def _flush_parquet(self):
+        if not self._rows:
+            return
+        # Written under a temporary name and renamed once closed, so a part file is
+        # either complete or absent
+        path = self._part_path(self._part)
+        self._pq.write_table(self._pa.Table.from_pylist(self._rows), f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        self._part += 1
+        self._mark_done([row['path'] for row in self._rows])
+        self._rows = []
+
+    def close(self):
+        if self.parquet:
+            self._flush_parquet()
+        else:
+            self._out.close()
+        self._checkpoint.close()
+
+
+def build_result(kind, output):
+    # Same response shape as the API processors
+    if kind == "audio":
+        return output['audio']
+    if 'zeroshot' in output and output['zeroshot']['label'] != 'error':
+        output['zeroshot']['reason'] = {'classification_scores': output['zeroshot']['reason']}
+    return {
+        'overall': engine.fuse(kind, output),
+        f'{kind}_models': output
+    }
+
+
+# -----------------------------
+# Pipeline
+# -----------------------------
+def scan(paths, out_path, workers, batch_size):
+    writer = ResultWriter(out_path)
+    results = queue.Queue()
+    batch_workers = {}
+    pending = {}  # path -> {'kind', 'output'}
+    stats = {'done': 0, 'errors': 0, 'skipped': 0}
+    started = time.monotonic()
+    last_report = 0.0
+
+    def report(final=False):
+        nonlocal last_report
+        now = time.monotonic()
+        if not final and now - last_report < 1.0:
+            return
+        last_report = now
+        rate = stats['done'] / max(now - started, 1e-6)
+        sys.stderr.write(f"\r[scan] {stats['done']} done, {len(pending)} in flight, "
+                         f"{stats['skipped']} skipped, {stats['errors']} errors | {rate:.2f} files/s")
+        if final:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+    def collect(block=False):
+        # Assemble per-model results; a file is written once all its models reported
+        while True:
+            try:
+                path, name, info = results.get(timeout=0.1) if block else results.get_nowait()
+            except queue.Empty:
+                return
+            block = False
+            entry = pending[path]
+            entry['output'][name] = info
+            if len(entry['output']) == len(MODALITY_MODELS[entry['kind']]):
+                del pending[path]
+                if any(m['label'] == 'error' for m in entry['output'].values()):
+                    stats['errors'] += 1
+                writer.write(path, entry['kind'], build_result(entry['kind'], entry['output']))
+                stats['done'] += 1
+
+    def dispatch(path, kind, decoded):
+        for name, features in decoded.items():
+            if '__error__' in features:
+                results.put((path, name, {
+                    'label': 'error',
+                    'confidence': 0.0,
+                    'reason': f"Exception: {features['__error__']}"
+                }))
+                continue
+            if name not in batch_workers:
+                batch_workers[name] = BatchWorker(name, batch_size, results)
+                batch_workers[name].start()
+            while True:
+                try:
+                    batch_workers[name].inbox.put((path, features), timeout=0.1)
+                    break
+                except queue.Full:
+                    collect()  # keep draining while the model catches up
+
+    # "spawn" keeps CUDA state out of the decoder processes
+    context = multiprocessing.get_context("spawn")
+    max_in_flight = workers * 4
+    futures = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            for path in paths:
+                kind = media_kind(path)
+                if kind is None or path in writer.done or path in pending:
+                    if kind is not None:
+                        stats['skipped'] += 1
+                    continue
+
+                # Bound the number of decoded-but-unscored inputs held in memory
+                while len(futures) >= max_in_flight:
+                    finished, _ = wait(futures, timeout=0.1, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        done_path, done_kind = futures.pop(future)
+                        dispatch(done_path, done_kind, future.result())
+                    collect()
+                    report()
+
+                pending[path] = {'kind': kind, 'output': {}}
+                futures[pool.submit(decode_file, kind, path)] = (path, kind)
+
+            while futures:
+                finished, _ = wait(futures, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done_path, done_kind = futures.pop(future)
+                    dispatch(done_path, done_kind, future.result())
+                collect()
+                report()
+
+        for worker in batch_workers.values():
+            worker.inbox.put(_STOP)
+        while pending:
+            collect(block=True)
+            report()
+        for worker in batch_workers.values():
+            worker.join()
+    finally:
+        report(final=True)
+        writer.close()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan a directory or manifest of media files for deepfakes")
+    parser.add_argument("root", nargs="?", help="Directory to scan recursively")
+    parser.add_argument("--manifest", help="Text file with one media path per line")
+    parser.add_argument("--out", required=True, help="Output file (.jsonl or .parquet)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Decoder processes")
+    parser.add_argument("--batch-size", type=int, default=16, help="Inference batch size per model")
+    args = parser.parse_args()
+
+    if not args.root and not args.manifest:
+        parser.error("give a directory or --manifest")
+
+    stats = scan(iter_inputs(args.root, args.manifest), args.out, args.workers, args.batch_size)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
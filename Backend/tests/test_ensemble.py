@@ -0,0 +1,80 @@
+from processors.ensemble import FusionEngine
+
+
+def verdict(label, confidence):
+    return {'label': label, 'confidence': confidence, 'reason': ''}
+
+
+def test_unfitted_group_keeps_majority_vote():
+    engine = FusionEngine()
+
+    # One vote each: ties go to "real", however sure the label-only model is
+    overall = engine.fuse("video", {'rppg': verdict('fake', 0.3), 'lipsync': verdict('real', 0.99)})
+    assert overall['label'] == "real"
+    assert overall['fake_by'] == ['rppg'] and overall['real_by'] == ['lipsync']
+    assert overall['fake_probability'] < 0.5
+
+    # Two fake votes win even when zeroshot's prompt confidence is low
+    overall = engine.fuse("image", {'zeroshot': verdict('Fake', 0.4), 'cnn': verdict('fake', 0.55)})
+    assert overall['label'] == "fake"
+    assert overall['fake_probability'] > 0.5
+
+
+def test_unfitted_group_ignores_errors_and_never_exits_early():
+    engine = FusionEngine({'groups': {'image': {'early_exit': {'fake': 0.6, 'real': 0.4}}}})
+    output = {'cnn': verdict('fake', 0.99), 'zeroshot': verdict('error', 0.0)}
+
+    assert not engine.decisive("image", output)
+    assert engine.stages("image", ['cnn', 'zeroshot']) == [['cnn', 'zeroshot']]
+    overall = engine.fuse("image", output)
+    assert overall['label'] == "fake"
+    assert overall['calibrated_scores'] == {'cnn': 0.99}
+    assert overall['skipped'] == [] and overall['early_exit'] is False
+
+
+FITTED = {'groups': {'image': {
+    'bias': -0.5,
+    'threshold': 0.5,
+    'early_exit': {'fake': 0.9, 'real': 0.1},
+    'order': ['cnn', 'zeroshot'],
+    'models': {
+        'cnn': {'weight': 2.0, 'calibration': {'type': 'platt', 'a': 6.0, 'b': -3.0}},
+        'zeroshot': {'weight': 0.5, 'calibration': {'type': 'platt', 'a': 4.0, 'b': -2.0}},
+    },
+}}}
+
+
+def test_fitted_group_calibrates_and_weights():
+    engine = FusionEngine(FITTED)
+
+    # cnn fake@0.9: sigmoid(6 * 0.9 - 3) = 0.9168; zeroshot real -> 0.25: sigmoid(4 * 0.25 - 2) = 0.2689
+    overall = engine.fuse("image", {'cnn': verdict('fake', 0.9), 'zeroshot': verdict('Real', 0.8)})
+    assert overall['calibrated_scores'] == {'cnn': 0.9168, 'zeroshot': 0.2689}
+    # z = -0.5 + 2.0 * logit(0.9168) + 0.5 * logit(0.2689) = 3.80
+    assert abs(overall['fake_probability'] - 0.9781) < 1e-3
+    assert overall['label'] == "fake"
+    assert overall['real_by'] == ['zeroshot']
+
+    # Fitted groups follow the fused probability, not the vote count
+    overall = engine.fuse("image", {'cnn': verdict('real', 0.6), 'zeroshot': verdict('Fake', 0.9)})
+    assert overall['label'] == "real"
+
+
+def test_fitted_group_cascades_cheapest_first():
+    engine = FusionEngine(FITTED)
+
+    assert engine.stages("image", ['zeroshot', 'cnn']) == [['cnn'], ['zeroshot']]
+    # Models missing from the configured order run last
+    assert engine.stages("image", ['zeroshot', 'cnn', 'extra']) == [['cnn'], ['zeroshot'], ['extra']]
+
+    # sigmoid(-0.5 + 2 * logit(sigmoid(6 * 0.95 - 3))) = 0.992 -> decisive fake
+    assert engine.decisive("image", {'cnn': verdict('fake', 0.95)})
+    # cnn real@0.95 -> raw 0.05 -> calibrated 0.0630 -> fused 0.0027 -> decisive real
+    assert engine.decisive("image", {'cnn': verdict('real', 0.95)})
+    # An unsure cheap model does not stop the cascade
+    assert not engine.decisive("image", {'cnn': verdict('fake', 0.55)})
+    # Nor does an error
+    assert not engine.decisive("image", {'cnn': verdict('error', 0.0)})
+
+    overall = engine.fuse("image", {'cnn': verdict('fake', 0.95)}, skipped=['zeroshot'])
+    assert overall['skipped'] == ['zeroshot'] and overall['early_exit'] is True
@@ -0,0 +1,223 @@
+# File: utils/admission.py
+
+import os
+import math
+import heapq
+import itertools
+import threading
+import time
+from functools import wraps
+from flask import request, jsonify
+
+# -----------------------------
+# Priority lanes
+# -----------------------------
+# Lower value is served first. Interactive traffic (the web extension and
+# frontend) jumps ahead of bulk batch jobs waiting for the same modality.
+PRIORITY_LANES = {
+    "interactive": 0,
+    "batch": 1,
+}
+DEFAULT_LANE = "interactive"
+
+# Per-modality defaults: (max concurrent jobs, max queued per lane, max wait in seconds)
+DEFAULT_LIMITS = {
+    "video": (1, 4, 60.0),
+    "image": (2, 8, 30.0),
+    "audio": (2, 8, 30.0),
+    "text": (2, 8, 30.0),
+    # Bulk text jobs (Google searches plus generation for up to 32 articles) get
+    # their own slot so they never hold the interactive text slots
+    "text_batch": (1, 4, 120.0),
+    "analyze": (1, 4, 60.0),
+}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """
+    Bounded concurrency limiter for one modality.
+
+    At most `max_concurrent` jobs run at once. Further requests wait in a
+    priority queue (one bounded lane per priority); a full lane is rejected
+    immediately with 429, and a request that waits longer than `max_wait`
+    seconds is rejected with 503.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, max_wait):
+        self.name = name
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = float(max_wait)
+
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._lane_depth = {lane: 0 for lane in PRIORITY_LANES}
+
+        self.active = 0
+        self.admitted = 0
+        self.completed = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self.peak_queue_depth = 0
+        self.avg_service_time = 0.0
+
+    def _retry_after(self):
+        # Rough estimate of when a slot frees up, never below one second
+        service_time = self.avg_service_time or 1.0
+        backlog = len(self._waiting) + 1
+        return max(1, math.ceil(service_time * backlog / self.max_concurrent))
+
+    def _can_start(self, ticket):
+        return self.active < self.max_concurrent and self._waiting[0] == ticket
+
+    def acquire(self, lane=DEFAULT_LANE):
+        if lane not in PRIORITY_LANES:
+            lane = DEFAULT_LANE
+        priority = PRIORITY_LANES[lane]
+        with self._cond:
+            if self.active < self.max_concurrent and not self._waiting:
+                self.active += 1
+                self.admitted += 1
+                return
+
+            if self._lane_depth[lane] >= self.max_queue:
+                self.rejected["queue_full"] += 1
+                raise AdmissionRejected(429, f"{self.name} queue is full", self._retry_after())
+
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            self._lane_depth[lane] += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, len(self._waiting))
+
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while not self._can_start(ticket):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._waiting.remove(ticket)
+                        heapq.heapify(self._waiting)
+                        self.rejected["timeout"] += 1
+                        raise AdmissionRejected(503, f"{self.name} is saturated", self._retry_after())
+                    self._cond.wait(remaining)
+
+                heapq.heappop(self._waiting)
+                self.active += 1
+                self.admitted += 1
+            finally:
+                self._lane_depth[lane] -= 1
+                # The head of the queue changed; let the next waiter re-check
+                self._cond.notify_all()
+
+    def release(self, service_time=None):
+        with self._cond:
+            self.active -= 1
+            self.completed += 1
+            if service_time is not None:
+                # Exponential moving average of how long a job holds a slot
+                if self.avg_service_time == 0.0:
+                    self.avg_service_time = service_time
+                else:
+                    self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * service_time
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active': self.active,
+                'max_concurrent': self.max_concurrent,
+                'queue_depth': len(self._waiting),
+                'queue_depth_by_lane': dict(self._lane_depth),
+                'max_queue_per_lane': self.max_queue,
+                'peak_queue_depth': self.peak_queue_depth,
+                'admitted': self.admitted,
+                'completed': self.completed,
+                'rejected': dict(self.rejected),
+                'avg_service_time': round(self.avg_service_time, 3),
+            }
+
+
+# -----------------------------
+# Gate registry
+# -----------------------------
+def _env_limit(modality, key, default, cast):
+    value = os.getenv(f"DG_{modality.upper()}_{key}")
+    return cast(value) if value else default
+
+
+def _build_gate(modality):
+    max_concurrent, max_queue, max_wait = DEFAULT_LIMITS.get(modality, (1, 4, 30.0))
+    return AdmissionGate(
+        modality,
+        _env_limit(modality, "MAX_CONCURRENT", max_concurrent, int),
+        _env_limit(modality, "MAX_QUEUE", max_queue, int),
+        _env_limit(modality, "MAX_WAIT", max_wait, float),
+    )
+
+
+gates = {modality: _build_gate(modality) for modality in DEFAULT_LIMITS}
+_gates_lock = threading.Lock()
+
+
+def get_gate(modality):
+    with _gates_lock:
+        if modality not in gates:
+            gates[modality] = _build_gate(modality)
+        return gates[modality]
+
+
+def admission_stats():
+    return {modality: gate.stats() for modality, gate in list(gates.items())}
+
+
+def request_lane(default=DEFAULT_LANE):
+    # Clients pick a lane with a header or a ?priority= query parameter
+    lane = request.headers.get('X-Request-Priority') or request.args.get('priority', default)
+    lane = lane.strip().lower()
+    return lane if lane in PRIORITY_LANES else default
+
+
+# -----------------------------
+# Flask decorator
+# -----------------------------
+def admission_controlled(modality, default_lane=DEFAULT_LANE):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            gate = get_gate(modality)
+            try:
+                gate.acquire(request_lane(default_lane))
+            except AdmissionRejected as e:
+                response = jsonify({
+                    'error': e.reason,
+                    'modality': modality,
+                    'retry_after': e.retry_after
+                })
+                response.status_code = e.status_code
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+
+            started = time.monotonic()
+            try:
+                response = view(*args, **kwargs)
+            except Exception:
+                gate.release(time.monotonic() - started)
+                raise
+
+            # Streamed responses keep working after the view returns; hold the slot until they close.
+            # Closing the response closes the event generator first, and the processors' generators
+            # wait there for their model threads, so a dropped client cannot free a slot early.
+            if getattr(response, 'is_streamed', False):
+                response.call_on_close(lambda: gate.release(time.monotonic() - started))
+            else:
+                gate.release(time.monotonic() - started)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,197 @@
+# File: utils/checkpoints.py
+#
+# Memory-mapped checkpoint loading.
+#
+# PyTorch weights are converted once to safetensors next to the original
+# .pth file:
+#
+#     python -m utils.checkpoints convert processors/*/models/*.pth
+#
+# At load time the .safetensors file is mapped into memory and its tensors are
+# assigned to the model directly, so nothing is unpickled or copied and every
+# worker process shares the same page-cache pages. Without a converted file
+# the loader falls back to torch.load(mmap=True), then to a plain torch.load.
+
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+import threading
+from contextlib import contextmanager
+import numpy as np
+import torch
+
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+# Checkpoints that wrap the weights in a training dict
+STATE_DICT_KEYS = ("model_state_dict", "state_dict")
+
+
+def safetensors_path(path):
+    return os.path.splitext(path)[0] + ".safetensors"
+
+
+def _unwrap(checkpoint):
+    for key in STATE_DICT_KEYS:
+        if isinstance(checkpoint, dict) and isinstance(checkpoint.get(key), dict):
+            return checkpoint[key]
+    return checkpoint
+
+
+# -----------------------------
+# Memory reporting
+# -----------------------------
+def memory_usage():
+    """Resident memory of this process in MB ({'rss', 'private', 'shared_file'}), or None off Linux."""
+    try:
+        fields = {}
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile"):
+                    fields[key] = int(value.split()[0]) / 1024  # kB -> MB
+        return {
+            'rss': round(fields.get("VmRSS", 0.0), 1),
+            'private': round(fields.get("RssAnon", 0.0), 1),
+            'shared_file': round(fields.get("RssFile", 0.0), 1),
+        }
+    except (OSError, ValueError):
+        return None
+
+
+load_reports = {}
+_reports_lock = threading.Lock()
+
+
+@contextmanager
+def load_report(name, path=None):
+    """Record how long loading `name` took and how much resident memory it added."""
+    before = memory_usage()
+    started = time.monotonic()
+    report = {'format': None, 'path': path}
+    yield report
+    after = memory_usage()
+    report['seconds'] = round(time.monotonic() - started, 3)
+    if before and after:
+        report['memory_mb'] = after
+        report['added_mb'] = {key: round(after[key] - before[key], 1) for key in after}
+    with _reports_lock:
+        load_reports[name] = report
+    print(f"[INFO] Loaded {name} ({report['format']}) in {report['seconds']}s"
+          + (f", +{report['added_mb']['rss']} MB RSS" if 'added_mb' in report else ""))
+
+
+def model_load_stats():
+    with _reports_lock:
+        return dict(load_reports)
+
+
+# -----------------------------
+# Loading
+# -----------------------------
+def mmap_safetensors(path):
+    """
+    Tensors of a .safetensors file backed by a copy-on-write memory map.
+    Pages are read lazily from the page cache and shared between processes
+    for as long as nothing writes to them (inference never does).
+    """
+    with open(path, "rb") as f:
+        header_len = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_len))
+
+    data = np.memmap(path, dtype=np.uint8, mode="c", offset=8 + header_len)
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        count = int(np.prod(info["shape"], dtype=np.int64))
+        if count == 0:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        tensors[name] = torch.frombuffer(data, dtype=dtype, count=count, offset=start).view(info["shape"])
+    return tensors
+
+
+def load_state_dict(path, device="cpu"):
+    """Return (state_dict, format) for `path`, preferring its converted .safetensors sibling."""
+    converted = safetensors_path(path)
+    if os.path.exists(converted):
+        try:
+            return mmap_safetensors(converted), "safetensors-mmap"
+        except Exception as e:
+            print(f"[WARN] Could not map {converted}, falling back to {path}: {e}")
+
+    try:
+        return _unwrap(torch.load(path, map_location=device, mmap=True)), "torch-mmap"
+    except (TypeError, RuntimeError):
+        # Older torch without mmap=True, or a legacy (non-zip) checkpoint
+        return _unwrap(torch.load(path, map_location=device)), "torch"
+
+
+def load_weights(model, path, device="cpu", name=None):
+    """
+    Load the checkpoint at `path` into `model` and record a load report under
+    `name`. On CPU the mapped tensors are assigned to the model as-is
+    (no copy); on GPU they are copied into the device parameters.
+    """
+    with load_report(name or os.path.basename(path), path) as report:
+        state_dict, report['format'] = load_state_dict(path, device)
+        if str(device) == "cpu":
+            try:
+                model.load_state_dict(state_dict, assign=True)
+                return model
+            except TypeError:
+                pass  # torch < 2.1 has no assign=
+        model.load_state_dict(state_dict)
+        return model
+
+
+# -----------------------------
+# Conversion
+# -----------------------------
+def convert(path):
+    from safetensors.torch import save_file
+
+    state_dict = _unwrap(torch.load(path, map_location="cpu"))
+    # safetensors refuses tensors that share storage; give each its own
+    tensors = {name: tensor.detach().contiguous().clone() for name, tensor in state_dict.items()}
+    out_path = safetensors_path(path)
+    save_file(tensors, out_path, metadata={'source': os.path.basename(path)})
+    return out_path, sum(t.numel() * t.element_size() for t in tensors.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert PyTorch checkpoints to memory-mappable safetensors")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert")
+    conv.add_argument("paths", nargs="+", help=".pth checkpoints to convert")
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.paths:
+        try:
+            out_path, size = convert(path)
+            print(f"{path} -> {out_path} ({size / 1e6:.1f} MB)")
+        except Exception as e:
+            failed += 1
+            print(f"[ERROR] {path}: {e}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
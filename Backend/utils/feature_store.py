@@ -0,0 +1,143 @@
+# File: utils/feature_store.py
+
+import os
+import json
+import time
+import uuid
+import shutil
+import numpy as np
+from utils.hashing import file_sha256
+
+# -----------------------------
+# Configuration
+# -----------------------------
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_DIR = os.getenv("DG_FEATURE_STORE", os.path.join(base_dir, "cache", "features"))
+ENABLED = os.getenv("DG_FEATURE_STORE_DISABLED", "0") != "1"
+
+
+class FeatureStore:
+    """
+    Versioned on-disk cache of intermediate features.
+
+    Layout: <root>/<extractor>/v<version>/<hash[:2]>/<hash>/{<name>.npy, meta.json}
+
+    Each entry is keyed by the input's content hash and the extractor's
+    version, so changing an extractor (bumping its version) never serves
+    stale features. Arrays are stored as plain .npy files and opened with
+    mmap_mode='r', so reading a stored corpus does not copy it into memory.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def _version_dir(self, extractor, version):
+        return os.path.join(self.root, extractor, f"v{version}")
+
+    def _entry_dir(self, extractor, version, content_hash):
+        return os.path.join(self._version_dir(extractor, version), content_hash[:2], content_hash)
+
+    def _read(self, entry_dir):
+        arrays = {}
+        for filename in os.listdir(entry_dir):
+            if filename.endswith(".npy"):
+                arrays[filename[:-4]] = np.load(os.path.join(entry_dir, filename), mmap_mode="r")
+        return arrays
+
+    def get(self, extractor, version, content_hash):
+        entry_dir = self._entry_dir(extractor, version, content_hash)
+        if not os.path.exists(os.path.join(entry_dir, "meta.json")):
+            return None
+        try:
+            return self._read(entry_dir)
+        except Exception as e:
+            print(f"[WARN] Ignoring unreadable feature entry {entry_dir}: {e}")
+            return None
+
+    def put(self, extractor, version, content_hash, arrays, source=None):
+        entry_dir = self._entry_dir(extractor, version, content_hash)
+        if os.path.exists(entry_dir):
+            return
+
+        # Write into a scratch directory, then rename it into place atomically
+        tmp_dir = f"{entry_dir}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_dir)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    'extractor': extractor,
+                    'version': version,
+                    'content_hash': content_hash,
+                    'source': source,
+                    'created': time.time(),
+                    'arrays': {name: [list(a.shape), str(a.dtype)] for name, a in arrays.items()}
+                }, f)
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another worker stored the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def entries(self, extractor, version):
+        """Yield (content_hash, meta, arrays) for every stored entry of one extractor version."""
+        version_dir = self._version_dir(extractor, version)
+        if not os.path.isdir(version_dir):
+            return
+        for shard in sorted(os.listdir(version_dir)):
+            shard_dir = os.path.join(version_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for content_hash in sorted(os.listdir(shard_dir)):
+                entry_dir = os.path.join(shard_dir, content_hash)
+                meta_path = os.path.join(entry_dir, "meta.json")
+                if content_hash.endswith(".tmp") or not os.path.exists(meta_path):
+                    continue
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                yield content_hash, meta, self._read(entry_dir)
+
+
+store = FeatureStore()
+
+
+def lookup(extractor, version, path):
+    """Return (content_hash, stored features or None) for `path`."""
+    content_hash = file_sha256(path)
+    if not ENABLED:
+        return content_hash, None
+    return content_hash, store.get(extractor, version, content_hash)
+
+
+def save(extractor, version, content_hash, features, source=None):
+    if not ENABLED or features is None:
+        return
+    try:
+        store.put(extractor, version, content_hash, features, source=source)
+    except Exception as e:
+        print(f"[WARN] Could not store {extractor} features: {e}")
+
+
+def get_or_extract(extractor, version, path, extract, progress=None):
+    """
+    Return the features of `path` for one extractor version, computing and
+    storing them with `extract(path)` on a miss. `extract` returns a dict of
+    NumPy arrays, or None when extraction fails (failures are not stored).
+    """
+    if not ENABLED:
+        return extract(path)
+
+    content_hash, features = lookup(extractor, version, path)
+    if features is not None:
+        if progress:
+            progress("features_cached")
+        return features
+
+    features = extract(path)
+    save(extractor, version, content_hash, features, source=os.path.basename(path))
+    return features
+
+
+def detached(features):
+    # Plain in-memory copies of (possibly memory-mapped) arrays, safe to pickle across processes
+    return None if features is None else {name: np.array(array) for name, array in features.items()}
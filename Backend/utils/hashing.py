@@ -0,0 +1,23 @@
+# File: utils/hashing.py
+
+import os
+import hashlib
+from functools import lru_cache
+
+
+@lru_cache(maxsize=256)
+def _sha256(path, size, mtime_ns, chunk_size):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """
+    Content hash of a file, read in 1 MB chunks so large videos never sit in memory.
+    Memoized on (path, size, mtime) since several models hash the same upload.
+    """
+    stat = os.stat(path)
+    return _sha256(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, chunk_size)
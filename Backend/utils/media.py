@@ -0,0 +1,137 @@
+# File: utils/media.py
+
+import os
+import tempfile
+import cv2
+import numpy as np
+import librosa
+from moviepy.editor import VideoFileClip
+
+
+def read_frames(video_path):
+    """Yield BGR frames one at a time; the capture is released when the generator closes."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def video_fps(video_path):
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return fps
+
+
+def decode_video(video_path, max_frames=None, max_side=None):
+    """
+    Decode up to `max_frames` frames into memory, downscaling so the longer
+    side is at most `max_side` pixels. Returns (frames, fps).
+    """
+    fps = video_fps(video_path)
+
+    frames = []
+    for frame in read_frames(video_path):
+        frames.append(_downscale(frame, max_side))
+        if max_frames and len(frames) >= max_frames:
+            break
+    return frames, fps
+
+
+def _downscale(frame, max_side):
+    if max_side:
+        h, w = frame.shape[:2]
+        scale = max_side / max(h, w)
+        if scale < 1.0:
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def decode_video_sampled(video_path, max_frames, max_side=None, num_keyframes=3, keyframe_side=None):
+    """
+    The first `max_frames` frames, downscaled to `max_side`, plus
+    `num_keyframes` frames evenly spaced over the full length, downscaled to
+    `keyframe_side`. Keyframes are reached by seeking; only when the frame
+    count is unknown is the file read to the end. Returns
+    (frames, keyframes, fps, total_frames).
+    """
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    try:
+        if count > 0:
+            frames = []
+            while len(frames) < max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(_downscale(frame, max_side))
+
+            # Skip the very first/last frames, which are often black or fades
+            keyframes = []
+            for pos in np.linspace(0, count - 1, num_keyframes + 2)[1:-1].astype(int):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(pos))
+                ret, frame = cap.read()
+                if ret:
+                    keyframes.append(_downscale(frame, keyframe_side))
+            return frames, keyframes, fps, count
+        return _decode_unknown_length(cap, fps, max_frames, max_side, num_keyframes, keyframe_side)
+    finally:
+        cap.release()
+
+
+def _decode_unknown_length(cap, fps, max_frames, max_side, num_keyframes, keyframe_side):
+    # Without a frame count, read to the end keeping a decimated sample whose stride
+    # doubles as it fills; frames between samples are only grabbed, not converted
+    frames, samples = [], []
+    stride = 1
+    index = 0
+    while cap.grab():
+        if index < max_frames or index % stride == 0:
+            ret, frame = cap.retrieve()
+            if ret:
+                if index < max_frames:
+                    frames.append(_downscale(frame, max_side))
+                if index % stride == 0:
+                    samples.append((index, _downscale(frame, keyframe_side)))
+                    if len(samples) >= 4 * max(num_keyframes, 1):
+                        stride *= 2
+                        samples = [(i, f) for i, f in samples if i % stride == 0]
+        index += 1
+
+    picks = np.linspace(0, len(samples) - 1, num_keyframes + 2)[1:-1] if len(samples) > num_keyframes \
+        else range(len(samples))
+    return frames, [samples[int(i)][1] for i in picks], fps, index
+
+
+def extract_audio_track(video_path, temp_wav_path=None):
+    # A unique temp file per call, so concurrent requests never overwrite each other's audio
+    if temp_wav_path is None:
+        fd, temp_wav_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+    try:
+        clip = VideoFileClip(video_path)
+        clip.audio.write_audiofile(temp_wav_path, verbose=False, logger=None)
+        clip.close()
+        return temp_wav_path
+    except Exception as e:
+        print(f"[ERROR] Audio extract failed: {e}")
+        if os.path.exists(temp_wav_path):
+            os.remove(temp_wav_path)
+        return None
+
+
+def load_audio_track(video_path):
+    """(samples, sample_rate) of the video's audio at its native rate, or None if it has none."""
+    temp_wav_path = extract_audio_track(video_path)
+    if temp_wav_path is None:
+        return None
+    try:
+        return librosa.load(temp_wav_path, sr=None)
+    finally:
+        os.remove(temp_wav_path)
@@ -0,0 +1,149 @@
+# File: utils/mediapipe_pool.py
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+import mediapipe as mp
+from utils.admission import get_gate
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# One graph per job that can run at once: the admission gates of the
+# modalities using a graph bound how many are needed.
+def _default_pool_size(modalities):
+    return sum(get_gate(modality).max_concurrent for modality in modalities)
+
+
+POOL_SIZE = int(os.getenv("DG_MEDIAPIPE_POOL_SIZE", "0"))
+CHECKOUT_TIMEOUT = float(os.getenv("DG_MEDIAPIPE_POOL_WAIT", "120"))
+
+
+class GraphPool:
+    """
+    Bounded pool of pre-initialized MediaPipe graphs.
+
+    MediaPipe solution objects are not safe to share between threads, and
+    building one (FaceMesh in particular) is expensive. Each video checks a
+    graph out for its whole run, and the graph is reset before it is reused
+    so tracking state never leaks from one video into the next. Graphs are
+    created on demand up to `size`; further checkouts wait for a return.
+    """
+
+    def __init__(self, name, factory, size):
+        self.name = name
+        self.size = max(1, int(size))
+        self._factory = factory
+        self._idle = queue.LifoQueue()  # most recently used graph first
+        self._lock = threading.Lock()
+        self.created = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.waited = 0
+
+    def _new_graph(self):
+        with self._lock:
+            if self.created >= self.size:
+                return None
+            self.created += 1
+        try:
+            return self._factory()
+        except Exception:
+            with self._lock:
+                self.created -= 1
+            raise
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        graph = self._new_graph()
+        if graph is not None:
+            return graph
+        with self._lock:
+            self.waited += 1
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError(f"No {self.name} graph became free within {timeout:.0f}s")
+
+    def _discard(self, graph):
+        try:
+            graph.close()
+        except Exception:
+            pass
+        with self._lock:
+            self.created -= 1
+
+    @contextmanager
+    def checkout(self, timeout=CHECKOUT_TIMEOUT):
+        graph = self._acquire(timeout)
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+        try:
+            yield graph
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            try:
+                graph.reset()  # drop tracking state before the next video
+                self._idle.put(graph)
+            except Exception as e:
+                print(f"[WARN] Discarding {self.name} graph that failed to reset: {e}")
+                self._discard(graph)
+
+    def warm(self):
+        # Build every graph up front so the first requests do not pay for it
+        graphs = []
+        while True:
+            graph = self._new_graph()
+            if graph is None:
+                break
+            graphs.append(graph)
+        for graph in graphs:
+            self._idle.put(graph)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'created': self.created,
+                'in_use': self.in_use,
+                'idle': self._idle.qsize(),
+                'checkouts': self.checkouts,
+                'waited': self.waited,
+            }
+
+
+# -----------------------------
+# Shared pools
+# -----------------------------
+# FaceDetection serves rPPG (video, analyze) and the CNN's face crops (image,
+# analyze keyframes). An analyze job runs both at once, so it counts twice.
+face_detection_pool = GraphPool(
+    "face_detection",
+    lambda: mp.solutions.face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.7),
+    POOL_SIZE or _default_pool_size(["video", "image", "analyze", "analyze"]),
+)
+face_mesh_pool = GraphPool(
+    "face_mesh",
+    lambda: mp.solutions.face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1),
+    POOL_SIZE or _default_pool_size(["video", "analyze"]),
+)
+
+pools = {pool.name: pool for pool in (face_detection_pool, face_mesh_pool)}
+
+
+def warm_pools():
+    for pool in pools.values():
+        try:
+            pool.warm()
+        except Exception as e:
+            print(f"[WARN] Could not initialize {pool.name} graphs: {e}")
+
+
+def pool_stats():
+    return {name: pool.stats() for name, pool in pools.items()}
@@ -0,0 +1,278 @@
+# File: utils/near_duplicate.py
+
+import os
+import json
+import time
+import uuid
+import threading
+from collections import defaultdict
+from utils.perceptual_hash import hamming, hash_image_file, hash_video_file
+
+# -----------------------------
+# Configuration
+# -----------------------------
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_PATH = os.getenv("DG_NEAR_DUP_INDEX", os.path.join(base_dir, "cache", "near_duplicates.jsonl"))
+ENABLED = os.getenv("DG_NEAR_DUP_DISABLED", "0") != "1"
+
+# Maximum Hamming distance (out of HASH_BITS) for two hashes to count as the same content.
+# A deepfake made from an indexed photo stays close to it in the global hash, so only
+# near-exact copies match, and every face region must match on its own as well.
+IMAGE_MAX_DISTANCE = int(os.getenv("DG_NEAR_DUP_IMAGE_DISTANCE", "4"))
+KEYFRAME_MAX_DISTANCE = int(os.getenv("DG_NEAR_DUP_KEYFRAME_DISTANCE", "4"))
+FACE_MAX_DISTANCE = int(os.getenv("DG_NEAR_DUP_FACE_DISTANCE", "6"))
+# Fraction of a video's keyframes that must match the same indexed video
+VIDEO_MIN_MATCH_FRACTION = float(os.getenv("DG_NEAR_DUP_VIDEO_FRACTION", "0.75"))
+
+
+# -----------------------------
+# BK-tree over Hamming distance
+# -----------------------------
+class BKTree:
+    def __init__(self):
+        self.root = None  # [hash, [entry ids], {distance: child}]
+
+    def add(self, value, entry_id):
+        if self.root is None:
+            self.root = [value, [entry_id], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(entry_id)
+                return
+            if d not in node[2]:
+                node[2][d] = [value, [entry_id], {}]
+                return
+            node = node[2][d]
+
+    def search(self, value, max_distance):
+        """Return [(distance, entry_id)] for every stored hash within max_distance."""
+        matches = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= max_distance:
+                matches.extend((d, entry_id) for entry_id in node[1])
+            # Triangle inequality: only children in [d - r, d + r] can match
+            for child_d, child in node[2].items():
+                if d - max_distance <= child_d <= d + max_distance:
+                    stack.append(child)
+        return matches
+
+
+def face_distance(query_faces, indexed_faces, max_distance=FACE_MAX_DISTANCE):
+    """
+    Worst distance between each query face and a distinct indexed face, or None
+    when the face counts differ or some face has no match within max_distance.
+    """
+    if indexed_faces is None or len(query_faces) != len(indexed_faces):
+        return None
+    remaining = [int(h, 16) for h in indexed_faces]
+    worst = 0
+    for face in query_faces:
+        d, closest = min((hamming(face, h), h) for h in remaining)
+        if d > max_distance:
+            return None
+        remaining.remove(closest)
+        worst = max(worst, d)
+    return worst
+
+
+# -----------------------------
+# Persistent verdict index
+# -----------------------------
+class NearDuplicateIndex:
+    """
+    Perceptual-hash index of previously analysed media and their verdicts.
+
+    Entries are appended to a JSONL file so the index survives restarts;
+    images and video keyframes live in separate BK-trees. A hit also needs
+    the face regions of the matched image or keyframe to match (see
+    face_distance). Each entry records the version of the models that
+    produced it, and lookups only return entries of the caller's version. Re-analysing identical content (same
+    hashes) supersedes the earlier entry, both live and when the file is
+    replayed at startup.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.entries = {}
+        self._by_hashes = {}  # (kind, hashes) -> id of the current entry for that content
+        self.trees = {"image": BKTree(), "video": BKTree()}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # tolerate a partially written last line
+                self._insert(entry)
+
+    def _insert(self, entry):
+        # Superseded entries stay in the BK-tree but are skipped by lookups
+        key = (entry['kind'], tuple(entry['hashes']))
+        superseded = self._by_hashes.get(key)
+        if superseded is not None:
+            self.entries.pop(superseded, None)
+        self._by_hashes[key] = entry['id']
+
+        self.entries[entry['id']] = entry
+        for h in entry['hashes']:
+            self.trees[entry['kind']].add(int(h, 16), entry['id'])
+
+    def _current(self, matches, version):
+        # Drop superseded entries and verdicts from other model versions
+        return [(d, entry_id) for d, entry_id in matches
+                if entry_id in self.entries and self.entries[entry_id].get('version') == version]
+
+    def add(self, kind, hashes, faces, result, version, source=None):
+        entry = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'hashes': [format(h, 'x') for h in hashes],
+            'faces': [[format(h, 'x') for h in frame_faces] for frame_faces in faces],
+            'version': version,
+            'source': source,
+            'created': time.time(),
+            'result': result
+        }
+        with self._lock:
+            self._insert(entry)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        return entry['id']
+
+    def lookup_image(self, image_hash, faces, version, max_distance=IMAGE_MAX_DISTANCE):
+        with self._lock:
+            matches = self._current(self.trees["image"].search(image_hash, max_distance), version)
+            # Closest match whose faces match too; among equally close ones, the newest verdict
+            for distance, entry_id in sorted(matches, key=lambda m: (m[0], -self.entries[m[1]]['created'])):
+                entry = self.entries[entry_id]
+                worst_face = face_distance(faces, (entry.get('faces') or [None])[0])
+                if worst_face is not None:
+                    break
+            else:
+                return None
+        return {
+            'match_id': entry_id,
+            'distance': distance,
+            'max_distance': max_distance,
+            'face_distance': worst_face,
+            'faces': len(faces),
+            'source': entry['source'],
+            'result': entry['result']
+        }
+
+    def lookup_video(self, keyframe_hashes, keyframe_faces, version, max_distance=KEYFRAME_MAX_DISTANCE,
+                     min_fraction=VIDEO_MIN_MATCH_FRACTION):
+        # Vote per indexed video: best distance of each query keyframe to one of its keyframes
+        # with the same faces
+        best = defaultdict(dict)
+        with self._lock:
+            for i, h in enumerate(keyframe_hashes):
+                candidates = self._current(self.trees["video"].search(h, max_distance), version)
+                for entry_id in {entry_id for _, entry_id in candidates}:
+                    entry = self.entries[entry_id]
+                    indexed_faces = entry.get('faces') or []
+                    for j, indexed in enumerate(entry['hashes']):
+                        distance = hamming(h, int(indexed, 16))
+                        if distance > max_distance or j >= len(indexed_faces):
+                            continue
+                        if face_distance(keyframe_faces[i], indexed_faces[j]) is None:
+                            continue
+                        prev = best[entry_id].get(i)
+                        if prev is None or distance < prev:
+                            best[entry_id][i] = distance
+
+            if not best:
+                return None
+            entry_id, hits = max(best.items(), key=lambda item: (len(item[1]), -sum(item[1].values()),
+                                                                 self.entries[item[0]]['created']))
+            fraction = len(hits) / len(keyframe_hashes)
+            if fraction < min_fraction:
+                return None
+            entry = self.entries[entry_id]
+
+        return {
+            'match_id': entry_id,
+            'distance': max(hits.values()),
+            'max_distance': max_distance,
+            'matched_keyframes': len(hits),
+            'source': entry['source'],
+            'result': entry['result']
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex()
+        return _index
+
+
+# -----------------------------
+# Processor helpers
+# -----------------------------
+def _cacheable(models_output):
+    return all(info['label'] not in ('error', 'unknown') for info in models_output.values())
+
+
+def _with_match(match):
+    results = dict(match['result'])
+    results['near_duplicate'] = {
+        'matched': True,
+        **{k: v for k, v in match.items() if k != 'result'}
+    }
+    return results
+
+
+def lookup_media(kind, path, version):
+    """
+    Hash `path` and look it up among verdicts produced by model `version`.
+
+    Returns (hashes, results): `hashes` are (global hashes, face hashes per
+    hash) for remember_media, and `results` is the prior verdict annotated
+    with a `near_duplicate` block when a close match exists, otherwise None.
+    """
+    if not ENABLED:
+        return None, None
+    try:
+        if kind == "image":
+            hashed = hash_image_file(path)
+            hashes = ([hashed[0]], [hashed[1]]) if hashed is not None else None
+            match = get_index().lookup_image(hashed[0], hashed[1], version) if hashes else None
+        else:
+            hashes = hash_video_file(path)
+            match = get_index().lookup_video(hashes[0], hashes[1], version) if hashes else None
+    except Exception as e:
+        print(f"[WARN] Near-duplicate lookup failed: {e}")
+        return None, None
+
+    return hashes, (_with_match(match) if match else None)
+
+
+def remember_media(kind, hashes, results, models_output, version, source=None):
+    """Index a freshly computed verdict and mark it as not a near-duplicate."""
+    results['near_duplicate'] = {'matched': False}
+    if ENABLED and hashes and _cacheable(models_output):
+        try:
+            get_index().add(kind, hashes[0], hashes[1],
+                            {k: v for k, v in results.items() if k != 'near_duplicate'},
+                            version, source=source)
+        except Exception as e:
+            print(f"[WARN] Near-duplicate indexing failed: {e}")
+    return results
@@ -0,0 +1,115 @@
+# File: utils/perceptual_hash.py
+
+import cv2
+import numpy as np
+from utils.mediapipe_pool import face_detection_pool
+
+# -----------------------------
+# Constants
+# -----------------------------
+HASH_SIZE = 8
+HASH_BITS = 2 * HASH_SIZE * HASH_SIZE  # pHash + dHash concatenated
+VIDEO_KEYFRAMES = 8
+MAX_FACES = 4
+FACE_DETECT_SIDE = 640  # faces are detected on a downscaled copy
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def _to_gray(image_cv):
+    if image_cv.ndim == 2:
+        return image_cv
+    return cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY)
+
+
+# -----------------------------
+# Image hashes
+# -----------------------------
+def dhash(gray, hash_size=HASH_SIZE):
+    # Horizontal gradient sign of a (hash_size+1) x hash_size thumbnail
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def phash(gray, hash_size=HASH_SIZE, highfreq_factor=4):
+    # Low-frequency DCT coefficients compared against their median
+    size = hash_size * highfreq_factor
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size]
+    median = np.median(low.flatten()[1:])  # ignore the DC term
+    return _bits_to_int(low > median)
+
+
+def image_hash(image_cv):
+    """128-bit perceptual hash (pHash in the high 64 bits, dHash in the low 64)."""
+    gray = _to_gray(image_cv)
+    return (phash(gray) << (HASH_SIZE * HASH_SIZE)) | dhash(gray)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# -----------------------------
+# Face-region hashes
+# -----------------------------
+# A face swap keeps the source's pose, framing and lighting, so the global hash
+# of a deepfake barely moves from its source. Hashing each face crop on its own
+# makes the swapped region count for the whole hash.
+def face_hashes(image_cv):
+    """Hashes of the detected face regions, left to right."""
+    height, width = image_cv.shape[:2]
+    scale = min(1.0, FACE_DETECT_SIDE / max(height, width))
+    small = cv2.resize(image_cv, (max(1, int(width * scale)), max(1, int(height * scale))),
+                       interpolation=cv2.INTER_AREA) if scale < 1.0 else image_cv
+    with face_detection_pool.checkout() as face_detector:
+        results = face_detector.process(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+
+    boxes = []
+    for detection in (results.detections or [])[:MAX_FACES]:
+        box = detection.location_data.relative_bounding_box
+        left, top = int(max(box.xmin, 0) * width), int(max(box.ymin, 0) * height)
+        right = int(min(box.xmin + box.width, 1) * width)
+        bottom = int(min(box.ymin + box.height, 1) * height)
+        if right - left >= 16 and bottom - top >= 16:
+            boxes.append((left, top, right, bottom))
+    return [image_hash(image_cv[top:bottom, left:right]) for left, top, right, bottom in sorted(boxes)]
+
+
+def hash_image_file(image_path):
+    """(image hash, face-region hashes), or None when the file cannot be read."""
+    image_cv = cv2.imread(image_path)
+    if image_cv is None:
+        return None
+    return image_hash(image_cv), face_hashes(image_cv)
+
+
+# -----------------------------
+# Video keyframe hashes
+# -----------------------------
+def hash_video_file(video_path, num_keyframes=VIDEO_KEYFRAMES):
+    """
+    Hash `num_keyframes` frames sampled evenly across the video. Returns
+    (keyframe hashes, face-region hashes of each keyframe), or None.
+    """
+    cap = cv2.VideoCapture(video_path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    hashes, faces = [], []
+
+    if frame_count > 0:
+        # Skip the very first/last frames, which are often black or fades
+        positions = np.linspace(0, frame_count - 1, num_keyframes + 2)[1:-1].astype(int)
+        for pos in positions:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(pos))
+            ret, frame = cap.read()
+            if ret:
+                hashes.append(image_hash(frame))
+                faces.append(face_hashes(frame))
+    cap.release()
+
+    return (hashes, faces) if hashes else None
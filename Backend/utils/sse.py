@@ -0,0 +1,37 @@
+# File: utils/sse.py
+
+import json
+from flask import Response, request, stream_with_context
+
+
+def wants_stream():
+    # Opt in with ?stream=1 or an EventSource-style Accept header
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(events):
+    """Stream an iterable of (event, data) pairs as Server-Sent Events."""
+    def generate():
+        try:
+            for event, data in events:
+                yield format_sse(event, data)
+        finally:
+            # Closing this generator does not close `events`; do it here so
+            # producers clean up before the response's on-close callbacks run
+            if hasattr(events, 'close'):
+                events.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # stop reverse proxies from buffering events
+        }
+    )
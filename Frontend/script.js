@@ -1644,7 +1644,9 @@ function processVideoAnalysis(data) {
         }
 
         if (lipsyncReason) {
-            lipsyncReason.textContent = data.video_models.lipsync.reason || 'No reason provided';
+            // Lip-sync reasons carry a summary plus per-window scores
+            const lipsyncReasonData = data.video_models.lipsync.reason;
+            lipsyncReason.textContent = (lipsyncReasonData && lipsyncReasonData.summary) || lipsyncReasonData || 'No reason provided';
         }
     } else {
         // Handle lipsync error